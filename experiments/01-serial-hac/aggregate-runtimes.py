@@ -11,9 +11,9 @@ import pandas as pd
 from dataclasses import dataclass
 from scipy.cluster.hierarchy import cut_tree
 from sklearn.metrics import adjusted_rand_score
-from aeon.datasets import load_classification
 
 sys.path.append(str(Path(__file__).resolve().parent.parent))
+from download_datasets import load_cached_labels
 from tqdm_joblib import tqdm_joblib
 
 DATA_FOLDER = Path("../data/datasets")
@@ -38,9 +38,7 @@ def _evaluate_clustering(exp, file):
     ari = np.nan
     if not exp.dataset.startswith("edeniss"):
         try:
-            _, y = load_classification(
-                exp.dataset, extract_path=DATA_FOLDER, load_equal_length=False
-            )
+            y = load_cached_labels(exp.dataset, DATA_FOLDER)
             n_clusters = len(np.unique(y))
             Z = np.loadtxt(file / "serial" / "hierarchy.csv", delimiter=",")
             clusters = cut_tree(Z, n_clusters=n_clusters).flatten()
@@ -6,7 +6,6 @@ import matplotlib.pyplot as plt
 
 from pathlib import Path
 
-from scipy.spatial.distance import squareform
 from scipy.stats import norm
 from scipy.special import erfinv
 
@@ -15,6 +14,7 @@ from aeon.distances import pairwise_distance
 
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 from plt_commons import cm
+from distances import DistanceCache, dataset_fingerprint
 
 RESULT_FOLDER = Path("results")
 distance_method_params = {
@@ -29,30 +29,27 @@ distance_method_params = {
 
 def main(dataset: str = "BeetleFly", distance: str = "dtw") -> None:
     RESULT_FOLDER.mkdir(exist_ok=True, parents=True)
-    cache_path = RESULT_FOLDER / f"{dataset}_{distance}_dists.npy"
-
-    if cache_path.exists():
-        print(f"Loading cached distances from {cache_path}")
-        dists = np.load(cache_path)
-        print("... done.")
-    else:
-        print(f"(Down-)loading dataset {dataset}")
-        X, y = load_classification(dataset, extract_path="../../data/datasets/")
-
-        print(f"Computing pairwise {distance} distances ...")
-        dists = pairwise_distance(
-            X, method=distance, **distance_method_params[distance]
-        )
-        np.save(cache_path, dists)
-        print("... done.")
+
+    print(f"(Down-)loading dataset {dataset}")
+    X, y = load_classification(dataset, extract_path="../../data/datasets/")
+
+    print(f"Loading or computing pairwise {distance} distances ...")
+    # we use the aeon implementation, so we use a separate cache namespace
+    dists = DistanceCache().condensed(
+        dataset_fingerprint([x.ravel() for x in X]),
+        f"aeon-{distance}",
+        distance_method_params[distance],
+        lambda: pairwise_distance(X, method=distance, **distance_method_params[distance]),
+    )
+    print("... done.")
 
     print("Estimating distribution parameters and fitting distribution ...")
-    n = dists.shape[0]
-    m = n * (n - 1) / 2
+    # the cache stores the condensed distance matrix
+    dists = np.asarray(dists, dtype=np.float64)
+    m = dists.shape[0]
     n_segments = int(np.log(m) / np.log(2))
     if n_segments % 2 == 1:
         n_segments += 1
-    dists = squareform(dists, force="tovector")
     mean = np.mean(dists)
     std = np.std(dists)
 
@@ -27,6 +27,11 @@ def parse_args(args):
         type=str,
         help="Overwrite the folder, where the datasets are stored",
     )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Reuse the JET feature encoding and pre-clustering across distances and linkages",
+    )
     return parser.parse_args(args)
 
 
@@ -61,7 +66,7 @@ def compute_whs(dataset, distance, linkage, data_folder):
     return whs
 
 
-def main(data_folder):
+def main(data_folder, use_cache=False):
     n_jobs = check_n_jobs(psutil.cpu_count(logical=False))
     print(f"Using {n_jobs} jobs")
     distances = list(distance_functions.keys())
@@ -85,6 +90,7 @@ def main(data_folder):
                         distance=distance,
                         linkage=linkage,
                         n_jobs=n_jobs,
+                        use_cache=use_cache,
                     )
 
                     np.savetxt(
@@ -107,4 +113,4 @@ def main(data_folder):
 
 if __name__ == "__main__":
     args = parse_args(sys.argv[1:])
-    main(args.datafolder if args.datafolder else DATA_FOLDER)
+    main(args.datafolder if args.datafolder else DATA_FOLDER, args.cache)
@@ -3,17 +3,217 @@ from __future__ import annotations
 from typing import Any, Optional
 
 import numpy as np
+from numba import njit
 from scipy.cluster.hierarchy import cut_tree, linkage
+from scipy.spatial.distance import cdist, squareform
 from sklearn.base import BaseEstimator, ClusterMixin
 
+# linkages whose Lance-Williams updates are reducible, so the nearest-neighbor chain
+# finds the same merges as the generic algorithm
+_nn_chain_methods = {"single": 0, "complete": 1, "average": 2, "weighted": 3, "ward": 4}
+# linkages whose algorithm only reads the condensed distances
+_read_only_methods = {"single"}
+
+
+def _euclidean_condensed(X: np.ndarray, max_bytes: int = 64 * 1024**2) -> np.ndarray:
+    """Condensed ``float32`` Euclidean distances, computed in blocks of rows."""
+    n = X.shape[0]
+    dists = np.empty(n * (n - 1) // 2, dtype=np.float32)
+    block_rows = max(1, max_bytes // (8 * max(1, n)))
+    for start in range(0, n, block_rows):
+        stop = min(n, start + block_rows)
+        block = cdist(X[start:stop], X[start:])
+        for i in range(start, stop):
+            # the pairs (i, j > i) form a contiguous row of the condensed vector
+            k = n * i - i * (i + 1) // 2
+            dists[k:k + n - 1 - i] = block[i - start, i - start + 1:]
+    return dists
+
+
+@njit(cache=True, nogil=True)
+def _condensed_index(n: int, i: int, j: int) -> int:
+    if i > j:
+        i, j = j, i
+    return n * i - i * (i + 1) // 2 + j - i - 1
+
+
+@njit(cache=True, nogil=True)
+def _mst_single_linkage(n: int, dists: np.ndarray) -> np.ndarray:
+    """Prim's algorithm on the condensed matrix; only reads ``dists``."""
+    z = np.empty((n - 1, 3), dtype=np.float64)
+    merged = np.zeros(n, dtype=np.bool_)
+    nearest = np.full(n, np.inf)
+    x = 0
+    for k in range(n - 1):
+        merged[x] = True
+        y = -1
+        best = np.inf
+        for i in range(n):
+            if merged[i]:
+                continue
+            d = dists[_condensed_index(n, x, i)]
+            if d < nearest[i]:
+                nearest[i] = d
+            if y < 0 or nearest[i] < best:
+                best = nearest[i]
+                y = i
+        z[k, 0] = x
+        z[k, 1] = y
+        z[k, 2] = best
+        x = y
+    return z
+
+
+@njit(cache=True, nogil=True)
+def _lance_williams(method: int, d_xi: float, d_yi: float, d_xy: float, nx: int, ny: int, ni: int) -> float:
+    if method == 0:
+        return min(d_xi, d_yi)
+    elif method == 1:
+        return max(d_xi, d_yi)
+    elif method == 2:
+        return (nx * d_xi + ny * d_yi) / (nx + ny)
+    elif method == 3:
+        return 0.5 * (d_xi + d_yi)
+    else:
+        t = 1.0 / (nx + ny + ni)
+        return np.sqrt((ni + nx) * t * d_xi * d_xi + (ni + ny) * t * d_yi * d_yi - ni * t * d_xy * d_xy)
+
+
+@njit(cache=True, nogil=True)
+def _nn_chain_linkage(n: int, dists: np.ndarray, method: int) -> np.ndarray:
+    """Nearest-neighbor chain algorithm that updates ``dists`` in-place."""
+    z = np.empty((n - 1, 3), dtype=np.float64)
+    size = np.ones(n, dtype=np.int64)
+    chain = np.empty(n, dtype=np.int64)
+    chain_length = 0
+    for k in range(n - 1):
+        if chain_length == 0:
+            for i in range(n):
+                if size[i] > 0:
+                    chain[0] = i
+                    chain_length = 1
+                    break
+
+        # grow the chain until its last two clusters are reciprocal nearest neighbors
+        while True:
+            x = chain[chain_length - 1]
+            y = -1
+            current_min = np.inf
+            if chain_length > 1:
+                y = chain[chain_length - 2]
+                current_min = dists[_condensed_index(n, x, y)]
+            for i in range(n):
+                if size[i] == 0 or i == x:
+                    continue
+                d = dists[_condensed_index(n, x, i)]
+                if y < 0 or d < current_min:
+                    current_min = d
+                    y = i
+            if chain_length > 1 and y == chain[chain_length - 2]:
+                break
+            chain[chain_length] = y
+            chain_length += 1
+        chain_length -= 2
+
+        if x > y:
+            x, y = y, x
+        nx = size[x]
+        ny = size[y]
+        z[k, 0] = x
+        z[k, 1] = y
+        z[k, 2] = current_min
+        # the merged cluster takes the place of y
+        size[x] = 0
+        size[y] = nx + ny
+        for i in range(n):
+            ni = size[i]
+            if ni == 0 or i == y:
+                continue
+            xi = _condensed_index(n, x, i)
+            yi = _condensed_index(n, y, i)
+            dists[yi] = _lance_williams(method, dists[xi], dists[yi], current_min, nx, ny, ni)
+    return z
+
+
+@njit(cache=True, nogil=True)
+def _find(parent: np.ndarray, x: int) -> int:
+    root = x
+    while parent[root] != root:
+        root = parent[root]
+    # path compression
+    while parent[x] != root:
+        next_x = parent[x]
+        parent[x] = root
+        x = next_x
+    return root
+
+
+@njit(cache=True, nogil=True)
+def _label_merges(n: int, merges: np.ndarray) -> np.ndarray:
+    """Convert merges of observation indices (sorted by distance) into a SciPy linkage matrix."""
+    z = np.empty((n - 1, 4), dtype=np.float64)
+    parent = np.arange(2 * n - 1)
+    size = np.ones(2 * n - 1, dtype=np.int64)
+    for k in range(n - 1):
+        a = _find(parent, int(merges[k, 0]))
+        b = _find(parent, int(merges[k, 1]))
+        if a > b:
+            a, b = b, a
+        parent[a] = n + k
+        parent[b] = n + k
+        size[n + k] = size[a] + size[b]
+        z[k, 0] = a
+        z[k, 1] = b
+        z[k, 2] = merges[k, 2]
+        z[k, 3] = size[n + k]
+    return z
+
+
+@njit(cache=True, nogil=True)
+def _cut_linkage(z: np.ndarray, n_clusters: int) -> np.ndarray:
+    """Apply the first ``n - n_clusters`` merges with a union-find structure.
+
+    The clusters are numbered in the order of their first observation, like `cut_tree`.
+    """
+    n = z.shape[0] + 1
+    parent = np.arange(2 * n - 1)
+    for k in range(n - max(1, min(n_clusters, n))):
+        parent[int(z[k, 0])] = n + k
+        parent[int(z[k, 1])] = n + k
+    labels = np.empty(n, dtype=np.int64)
+    cluster_ids = np.full(2 * n - 1, -1, dtype=np.int64)
+    next_id = 0
+    for i in range(n):
+        root = _find(parent, i)
+        if cluster_ids[root] < 0:
+            cluster_ids[root] = next_id
+            next_id += 1
+        labels[i] = cluster_ids[root]
+    return labels
+
 
 class LinkageClustering(BaseEstimator, ClusterMixin):
+    """Agglomerative clustering with SciPy-compatible linkage matrices.
+
+    With ``metric="precomputed"``, `fit` expects a condensed distance vector (e.g.,
+    a ``float32`` memory-map) or a square distance matrix; a 1-dimensional input is
+    always treated as condensed distances. Otherwise, the Euclidean distances between
+    the rows of the observation matrix are computed as a condensed ``float32`` vector.
+    Single linkage uses a minimum spanning tree, which reads condensed input (e.g., a
+    memory-map) in place. The other reducible linkages use the nearest-neighbor chain
+    algorithm, which updates the condensed distances in-place: the input is copied
+    unless ``overwrite_input=True`` and it is writable. Centroid and median linkage
+    fall back to SciPy.
+    """
+
     def __init__(
         self,
         n_clusters: int,
         linkage: str = "single",
         n_jobs: int = 1,
         verbose: bool = False,
+        metric: str = "euclidean",
+        overwrite_input: bool = False,
     ) -> None:
         super().__init__()
 
@@ -21,13 +221,49 @@ class LinkageClustering(BaseEstimator, ClusterMixin):
         self.linkage = linkage
         self.n_jobs = n_jobs
         self.verbose = verbose
+        self.metric = metric
+        self.overwrite_input = overwrite_input
+
+    def _condensed_distances(self, X: np.ndarray) -> np.ndarray:
+        if X.ndim == 1 or self.metric == "precomputed":
+            if X.ndim == 2:
+                return squareform(X, checks=False).astype(np.float32)
+            if isinstance(X, np.ndarray) and X.dtype in (np.float32, np.float64):
+                if self.linkage in _read_only_methods:
+                    return np.asarray(X)
+                if self.overwrite_input and X.flags.writeable:
+                    return X
+            return np.array(X, dtype=np.float32)
+        return _euclidean_condensed(np.asarray(X, dtype=np.float64))
 
     def fit(self, X: np.ndarray, y: Optional[np.ndarray] = None) -> LinkageClustering:
-        self._linkage_matrix = linkage(X, method=self.linkage)
+        if self.linkage not in _nn_chain_methods:
+            # centroid and median linkage are not reducible
+            if X.ndim == 1 or self.metric == "precomputed":
+                X = squareform(X, checks=False) if X.ndim == 2 else np.asarray(X, dtype=np.float64)
+            self._linkage_matrix = linkage(X, method=self.linkage)
+            return self
+
+        dists = self._condensed_distances(X)
+        n = int(np.ceil(np.sqrt(2 * dists.shape[0])))
+        if n * (n - 1) // 2 != dists.shape[0]:
+            raise ValueError(f"Invalid condensed distance vector with {dists.shape[0]} entries")
+        if n < 2:
+            self._linkage_matrix = np.empty((0, 4), dtype=np.float64)
+            return self
+        if self.linkage == "single":
+            merges = _mst_single_linkage(n, dists)
+        else:
+            merges = _nn_chain_linkage(n, dists, _nn_chain_methods[self.linkage])
+        merges = merges[np.argsort(merges[:, 2], kind="stable")]
+        self._linkage_matrix = _label_merges(n, merges)
         return self
 
     def predict(self, X: Optional[Any] = None) -> np.ndarray:
-        return cut_tree(self._linkage_matrix, n_clusters=self.n_clusters).flatten()
+        if self.linkage not in _nn_chain_methods:
+            # the merge heights of centroid and median linkage are not monotonic
+            return cut_tree(self._linkage_matrix, n_clusters=self.n_clusters).reshape(-1)
+        return _cut_linkage(self._linkage_matrix, self.n_clusters)
 
     def fit_predict(self, X: np.ndarray, y: Optional[np.ndarray] = None) -> np.ndarray:
         return self.fit(X).predict(X)
@@ -0,0 +1,154 @@
+"""Cache of the distance- and linkage-independent stages of JET.
+
+JET first encodes the time series as feature vectors and pre-clusters them (see
+``scripts/compute-birch-preclustering.py``); only the later stages depend on the
+distance measure and the linkage. `JETStageCache.install` wraps these two stages of a
+`JET` instance, so that their outputs and the fitted stages are loaded from memory or
+disk if the same input was processed with the same parameters before.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pickle
+import sys
+import tempfile
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, Optional, Tuple, Union
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from distances import dataset_fingerprint
+
+DEFAULT_CACHE_FOLDER = Path(__file__).resolve().parent.parent.parent / "data" / "jet-stage-cache"
+
+
+class JETStageCache:
+    """Stage outputs and fitted stages keyed by stage name, stage parameters, and input fingerprint.
+
+    Entries are kept in memory for the lifetime of the cache object and stored below
+    ``root`` as a ``.npy`` file with the output and a ``.pkl`` file with the fitted
+    stage, so that later calls such as ``JET.predict`` work after a cache hit; the
+    folder can be changed with the environment variable ``JET_STAGE_CACHE_FOLDER``.
+    """
+
+    def __init__(self, root: Optional[Union[str, Path]] = None) -> None:
+        self.root = Path(root or os.environ.get("JET_STAGE_CACHE_FOLDER", DEFAULT_CACHE_FOLDER))
+        self._memory: Dict[str, Tuple[np.ndarray, bytes]] = {}
+
+    @staticmethod
+    def key(stage: str, params: Dict[str, Any], fingerprint: str) -> str:
+        description = json.dumps({"input": fingerprint, "params": params}, sort_keys=True, default=str)
+        return f"{stage}-{hashlib.blake2b(description.encode(), digest_size=16).hexdigest()}"
+
+    def get(self, key: str) -> Optional[Tuple[np.ndarray, Any]]:
+        """Return the output and a fresh copy of the fitted stage, if present."""
+        if key not in self._memory:
+            result_path = self.root / f"{key}.npy"
+            stage_path = self.root / f"{key}.pkl"
+            if not (result_path.exists() and stage_path.exists()):
+                return None
+            self._memory[key] = (np.load(result_path), stage_path.read_bytes())
+        result, stage = self._memory[key]
+        # unpickle for every hit, so that JET instances never share a fitted stage
+        return result, pickle.loads(stage)
+
+    def put(self, key: str, result: np.ndarray, stage: Any) -> None:
+        result = np.asarray(result)
+        stage = pickle.dumps(stage, protocol=pickle.HIGHEST_PROTOCOL)
+        self._memory[key] = (result, stage)
+        self.root.mkdir(parents=True, exist_ok=True)
+        # the stage is written first: get requires both files
+        self._write(self.root / f"{key}.pkl", lambda fh: fh.write(stage))
+        self._write(self.root / f"{key}.npy", lambda fh: np.save(fh, result))
+
+    def _write(self, path: Path, write: Callable[[IO[bytes]], Any]) -> None:
+        # write to a temporary file first, so that readers never see partial files
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fh:
+            write(fh)
+        os.replace(tmp, path)
+
+    def install(self, jet: Any) -> Any:
+        """Wrap the feature encoder and the pre-clustering of a `JET` instance."""
+        from jet.feature_encoder import FeatureEncoder
+        from jet.pre_clustering import PreClustering
+
+        stages = {FeatureEncoder: "features", PreClustering: "prelabels"}
+        installed = set()
+        for name, value in list(vars(jet).items()):
+            for stage_type, stage in stages.items():
+                if isinstance(value, stage_type):
+                    setattr(jet, name, _CachedStage(value, stage, self))
+                    installed.add(stage)
+        if installed != set(stages.values()):
+            raise RuntimeError(f"Could not find the JET stages {set(stages.values()) - installed} to cache")
+        return jet
+
+
+class _CachedStage:
+    """Proxy of a JET stage whose ``fit_transform`` and ``fit_predict`` use the cache.
+
+    On a hit, the wrapped stage is replaced by the cached fitted stage, so that the
+    other methods, reached through ``__getattr__``, see a fitted stage.
+    """
+
+    def __init__(self, stage: Any, name: str, cache: JETStageCache) -> None:
+        self._stage = stage
+        self._name = name
+        self._cache = cache
+
+    @property
+    def _params(self) -> Dict[str, Any]:
+        if hasattr(self._stage, "get_params"):
+            params = self._stage.get_params()
+        else:
+            params = {k: v for k, v in vars(self._stage).items() if not k.startswith("_")}
+        # the number of jobs and the verbosity do not change the outputs
+        params = {
+            k: v for k, v in params.items()
+            if k not in ("n_jobs", "verbose") and isinstance(v, (str, int, float, bool, type(None)))
+        }
+        return {"type": type(self._stage).__name__, **params}
+
+    def _cached_fit(self, method: str, X: Any) -> np.ndarray:
+        key = self._cache.key(self._name, self._params, dataset_fingerprint(X))
+        entry = self._cache.get(key)
+        if entry is None:
+            result = getattr(self._stage, method)(X)
+            self._cache.put(key, result, self._stage)
+            return result
+        result, self._stage = entry
+        return result
+
+    def fit_transform(self, X: Any, y: Any = None) -> np.ndarray:
+        return self._cached_fit("fit_transform", X)
+
+    def fit_predict(self, X: Any, y: Any = None) -> np.ndarray:
+        return self._cached_fit("fit_predict", X)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._stage, name)
+
+
+def _test_stage_cache():
+    """A warm-cache run must give the same labels as a cold run, also via ``predict``."""
+    from jet import JET
+
+    rng = np.random.default_rng(42)
+    X = [rng.standard_normal(rng.integers(50, 100)) + c for c in range(3) for _ in range(20)]
+    with tempfile.TemporaryDirectory() as root:
+        labels = []
+        for _ in range(2):
+            # a new cache object per run, so that the warm run reads from disk
+            jet = JETStageCache(root).install(JET(n_clusters=3, n_pre_clusters=None, c=1.0))
+            jet.fit(X)
+            labels.append(jet.predict(X))
+    assert np.array_equal(labels[0], labels[1]), "warm-cache labels differ from the cold run"
+    print("warm-cache labels match the cold run")
+
+
+if __name__ == "__main__":
+    _test_stage_cache()
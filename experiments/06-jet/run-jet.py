@@ -50,10 +50,15 @@ def parse_args(args):
         default=DEFAULT_N_JOBS,
         help="Number of jobs to use for parallel processing",
     )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Reuse (and fill) the JET stage cache; the runtime then excludes cached stages",
+    )
     return parser.parse_args(args)
 
 
-def main(data_folder, result_path, dataset, distance, linkage, n_jobs):
+def main(data_folder, result_path, dataset, distance, linkage, n_jobs, use_cache=False):
     print(f"Using {n_jobs} jobs")
 
     try:
@@ -63,6 +68,7 @@ def main(data_folder, result_path, dataset, distance, linkage, n_jobs):
             distance=distance,
             linkage=linkage,
             n_jobs=n_jobs,
+            use_cache=use_cache,
         )
         print(
             f"JET took {runtime:.2f} seconds to process {dataset} with {distance} - {linkage}: "
@@ -87,4 +93,4 @@ if __name__ == "__main__":
     result_path = RESULT_FOLDER / "hierarchies" / f"hierarchy-{dataset}-{distance}-{linkage}.csv"
     result_path.parent.mkdir(exist_ok=True, parents=True)
 
-    main(data_folder, result_path, dataset, distance, linkage, n_jobs)
+    main(data_folder, result_path, dataset, distance, linkage, n_jobs, args.cache)
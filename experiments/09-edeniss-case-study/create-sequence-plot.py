@@ -12,11 +12,11 @@ import matplotlib.pyplot as plt
 import matplotlib.colors as mcolors
 import numpy as np
 
-from aeon.datasets import load_from_ts_file
 from pathlib import Path
 from scipy.cluster.hierarchy import fcluster
 
 sys.path.append(str(Path(__file__).parent.parent))
+from ts_format import read_ts_file
 
 
 def main(sys_args):
@@ -28,8 +28,8 @@ def main(sys_args):
     plot_results(dataset, strategy, distance, linkage)
 
 def plot_results(dataset, strategy, distance, linkage):
-    X, y = load_from_ts_file(f'datasets/edeniss20182020_anomalies/{dataset}.ts',)
-    X = [x[0] for x in X]
+    X, y, _ = read_ts_file(f'datasets/edeniss20182020_anomalies/{dataset}.ts')
+    X = X.to_list()
     max_len = max(len(a) for a in X)
     X_padded = np.array([np.pad(x, (0, max_len - len(x)), constant_values=np.nan) for x in X])
     Z = np.genfromtxt(
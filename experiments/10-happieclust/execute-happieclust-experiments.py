@@ -15,7 +15,7 @@ sys.path.append(str(Path(__file__).resolve().parent.parent))
 from download_datasets import DATA_FOLDER, select_aeon_datasets, select_edeniss_datasets
 from plt_commons import linkages, distances
 
-from happieclust_wrapper import run_happieclust
+from happieclust_wrapper import compute_happieclust_graph, compute_happieclust_linkage
 
 RESULT_FOLDER = Path("results")
 
@@ -71,36 +71,48 @@ def main(data_folder):
     aggregated_result_file = RESULT_FOLDER / "results.csv"
     print(f"Storing results in {aggregated_result_file}")
     with open(aggregated_result_file, "w") as f:
-        f.write("dataset,distance,linkage,runtime,ARI,whs\n")
+        f.write("dataset,distance,linkage,runtime,graph_runtime,linkage_runtime,ARI,whs\n")
 
     for distance in distances:
         for dataset in tqdm(datasets):
-            for linkage in linkages:
-                try:
-                    h, runtime, ari = run_happieclust(
-                        dataset=dataset,
-                        distance=distance,
-                        linkage=linkage,
-                        n_jobs=n_jobs,
-                        data_folder=data_folder,
-                    )
-
-                    np.savetxt(
-                        RESULT_FOLDER
-                        / "hierarchies"
-                        / f"hierarchy-{dataset}-{distance}-{linkage}.csv",
-                        h,
-                        delimiter=",",
-                    )
-                except Exception as e:
-                    print(f"Error for {dataset} with {distance} - {linkage}: {repr(e)}")
-                    runtime = np.nan
-                    ari = np.nan
+            # the distance graph does not depend on the linkage, so we compute it only
+            # once per dataset and distance
+            results = {}
+            try:
+                graph = compute_happieclust_graph(
+                    dataset=dataset,
+                    distance=distance,
+                    n_jobs=n_jobs,
+                    data_folder=data_folder,
+                )
+            except Exception as e:
+                print(f"Error for {dataset} with {distance} (distance graph): {repr(e)}")
+            else:
+                for linkage in linkages:
+                    try:
+                        h, linkage_runtime, ari = compute_happieclust_linkage(graph, linkage)
+                        np.savetxt(
+                            RESULT_FOLDER
+                            / "hierarchies"
+                            / f"hierarchy-{dataset}-{distance}-{linkage}.csv",
+                            h,
+                            delimiter=",",
+                        )
+                        results[linkage] = (graph.runtime, linkage_runtime, ari)
+                    except Exception as e:
+                        print(f"Error for {dataset} with {distance} - {linkage}: {repr(e)}")
 
-                whs = compute_whs(dataset, distance, linkage, data_folder)
+            for linkage in linkages:
+                graph_runtime, linkage_runtime, ari = results.get(linkage, (np.nan, np.nan, np.nan))
+                # the total runtime includes the shared distance graph computation
+                runtime = graph_runtime + linkage_runtime
+                whs = compute_whs(dataset, distance, linkage, data_folder) if linkage in results else np.nan
 
                 with open(aggregated_result_file, "a") as f:
-                    f.write(f"{dataset},{distance},{linkage},{runtime},{ari},{whs}\n")
+                    f.write(
+                        f"{dataset},{distance},{linkage},{runtime},{graph_runtime},{linkage_runtime},"
+                        f"{ari},{whs}\n"
+                    )
 
 
 if __name__ == "__main__":
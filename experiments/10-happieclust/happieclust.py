@@ -2,19 +2,33 @@
 # https://github.com/HPI-Information-Systems/tidewater/blob/main/tidewater/transformers/clusterings/happie_clust.py
 from __future__ import annotations
 
+import heapq
+import sys
+import time
+import warnings
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
-from itertools import combinations
-from typing import Any, List, Optional, Tuple
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterator, List, Optional, Tuple
 
-import networkx as nx
 import numpy as np
-
-from distances import distance_pairs, matrix_other
-from numba import njit
+from numba import njit, types
+from numba.typed import Dict as TypedDict
+from numba.typed import List as TypedList
 from scipy.cluster.hierarchy import cut_tree
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
 from sklearn.neighbors import KDTree
-from tqdm import tqdm
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from distances import (
+    DistanceCache,
+    RaggedSeries,
+    dataset_fingerprint,
+    distance_engines,
+    distance_pairs,
+    matrix_other,
+)
 
 
 class Clustering(ABC):
@@ -64,48 +78,254 @@ def _recalculate_distance(method: str, distance_a: float, distance_b: float) ->
         return (distance_a + distance_b) / 2
 
 
-def _approximate_hierarchical_clustering(X: List[np.ndarray], distances: nx.Graph, method: str, verbose: bool = False) -> np.ndarray:
-    n = len(X)
-    # print(f"m = {len(distances.edges()) / ((n*(n-1))/2)}")
-    z_matrix = []
-    new_node = len(X)
-    included_nodes = {i: 1 for i in range(len(X))}
-
-    for _ in tqdm(range(n - 1), disable=not verbose):
-        (u, v, distance) = min(distances.edges(data="distance"), key=lambda x: x[2])
-        # print(u, v, distance, included_nodes[u] + included_nodes[v])
-        z_matrix.append([u, v, distance, included_nodes[u] + included_nodes[v]])
+@dataclass
+class DistanceGraph:
+    """Sparse undirected graph of the known distances as parallel edge arrays.
+
+    Each edge is stored once with ``u < v``; the edges are kept sorted and unique by
+    their packed key ``u * n + v``.
+    """
+    n: int
+    u: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int32))
+    v: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int32))
+    distance: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.float32))
+
+    @property
+    def n_edges(self) -> int:
+        return self.u.shape[0]
+
+    @property
+    def keys(self) -> np.ndarray:
+        return self.u.astype(np.int64) * self.n + self.v
+
+    def add_edges(self, pairs: np.ndarray, distances: np.ndarray) -> None:
+        """Insert the edges; the distances of existing edges are overwritten."""
+        pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+        distances = np.asarray(distances, dtype=np.float32).reshape(-1)
+        no_loop = pairs[:, 0] != pairs[:, 1]
+        pairs, distances = pairs[no_loop], distances[no_loop]
+        u = np.minimum(pairs[:, 0], pairs[:, 1])
+        v = np.maximum(pairs[:, 0], pairs[:, 1])
+
+        keys = np.concatenate((self.keys, u * self.n + v))
+        distances = np.concatenate((self.distance, distances))
+        # keep the last occurrence of each key, so that new edges win
+        keys, last = np.unique(keys[::-1], return_index=True)
+        self.u = (keys // self.n).astype(np.int32)
+        self.v = (keys % self.n).astype(np.int32)
+        self.distance = distances[::-1][last]
+
+    def to_csr(self) -> csr_matrix:
+        """Symmetric ``(n, n)`` sparse adjacency matrix with the distances as weights."""
+        rows = np.concatenate((self.u, self.v))
+        cols = np.concatenate((self.v, self.u))
+        return csr_matrix((np.concatenate((self.distance, self.distance)), (rows, cols)), shape=(self.n, self.n))
+
+    def connected_components(self) -> Tuple[int, np.ndarray]:
+        return connected_components(self.to_csr(), directed=False)
+
+
+@njit(cache=True)
+def _sparse_linkage(n: int, us: np.ndarray, vs: np.ndarray, ds: np.ndarray, method: str) -> np.ndarray:
+    # adjacency map per cluster; a merged cluster lives on in the slot of its larger part
+    adjacency = TypedList()
+    for _ in range(n):
+        adjacency.append(TypedDict.empty(key_type=types.int64, value_type=types.float64))
+    heap = []
+    for k in range(us.shape[0]):
+        u, v, d = np.int64(us[k]), np.int64(vs[k]), np.float64(ds[k])
+        if u == v:
+            continue
+        adjacency[u][v] = d
+        adjacency[v][u] = d
+        heap.append((d, min(u, v), max(u, v)))
+    heapq.heapify(heap)
+
+    # cluster ID (scipy convention) and size of each slot
+    labels = np.arange(n)
+    sizes = np.ones(n, dtype=np.int64)
+    z_matrix = np.empty((n - 1, 4))
+    n_merges = 0
+    while n_merges < n - 1 and len(heap) > 0:
+        d, u, v = heapq.heappop(heap)
+        # lazy deletion: skip edges of merged clusters and outdated distances
+        if v not in adjacency[u] or adjacency[u][v] != d:
+            continue
+        z_matrix[n_merges, 0] = min(labels[u], labels[v])
+        z_matrix[n_merges, 1] = max(labels[u], labels[v])
+        z_matrix[n_merges, 2] = d
+        z_matrix[n_merges, 3] = sizes[u] + sizes[v]
         # if u has more outgoing edges, swap u and v
-        if len(distances[u]) > len(distances[v]):
+        if len(adjacency[u]) > len(adjacency[v]):
             u, v = v, u
 
-        new_edges = []
-        stale_edges = []
-        for (x, attr) in distances[u].items():
+        # merge the edges of u into v
+        adjacency_u = adjacency[u]
+        adjacency_v = adjacency[v]
+        del adjacency_v[u]
+        for x, distance in adjacency_u.items():
             if x == v:
                 continue
-            new_edge = (v, x)
-            # check if edge already exists
-            if x in distances[v]:
-                distance = _recalculate_distance(method, attr["distance"], distances[v][x]["distance"])
-                if distance is not None:
-                    attr["distance"] = distance
-                else:
-                    raise ValueError(f"Unknown method: {method}")
-                stale_edges.append((v, x))
-
-            new_edges.append((*new_edge, attr))
-
-        # update graph
-        distances.remove_edges_from(stale_edges)
-        distances.add_edges_from(new_edges)
-
-        # rename node v to new_node to connect clusters
-        distances = nx.relabel_nodes(distances, {v: new_node})
-        included_nodes[new_node] = included_nodes[u] + included_nodes[v]
-        distances.remove_node(u)
-        new_node += 1
-    return np.array(z_matrix)
+            if x in adjacency_v:
+                distance = _recalculate_distance(method, distance, adjacency_v[x])
+            adjacency_v[x] = distance
+            del adjacency[x][u]
+            adjacency[x][v] = distance
+            heapq.heappush(heap, (distance, min(v, x), max(v, x)))
+        adjacency_u.clear()
+
+        labels[v] = n + n_merges
+        sizes[v] += sizes[u]
+        n_merges += 1
+    return z_matrix[:n_merges]
+
+
+def _close_pairs_kdtree(pivot_space: np.ndarray, epsilon: float, max_bytes: Optional[int]) -> Optional[np.ndarray]:
+    """Pairs within Chebyshev distance ``epsilon``; ``None`` if they exceed ``max_bytes``."""
+    kd_tree = KDTree(pivot_space, metric="chebyshev")
+    n = pivot_space.shape[0]
+    chunks = []
+    total_bytes = 0
+    start = 0
+    if max_bytes is None:
+        max_bytes = np.iinfo(np.int64).max
+    # a small first chunk estimates the number of neighbors per row
+    chunk_size = min(n, 64)
+    while start < n:
+        stop = min(start + chunk_size, n)
+        neighbors = kd_tree.query_radius(pivot_space[start:stop], epsilon)
+        counts = np.fromiter((len(nb) for nb in neighbors), dtype=np.int64, count=stop - start)
+        i = np.repeat(np.arange(start, stop, dtype=np.int64), counts)
+        j = np.concatenate(neighbors).astype(np.int64) if counts.sum() > 0 else np.empty(0, dtype=np.int64)
+        keep = i < j
+        chunks.append(np.stack((i[keep], j[keep]), axis=1))
+        total_bytes += chunks[-1].nbytes
+        if total_bytes > max_bytes:
+            return None
+        # adapt the chunk size, so that the neighbor arrays of a chunk stay below the remaining budget
+        bytes_per_row = max(1.0, 16 * counts.sum() / (stop - start))
+        chunk_size = max(1, int((max_bytes - total_bytes) / bytes_per_row))
+        start = stop
+    pairs = np.concatenate(chunks) if chunks else np.empty((0, 2), dtype=np.int64)
+    return pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+
+
+# measures that satisfy the triangle inequality on series of equal length, for which the
+# pivot distances bound the distances of all pairs (SBD does not)
+_metric_distances = {"euclidean", "lorentzian", "chebyshev"}
+
+
+@njit(cache=True, nogil=True)
+def _pivot_bounds(pivot_distances: np.ndarray, pairs: np.ndarray, lower: np.ndarray, upper: np.ndarray) -> None:
+    for k in range(pairs.shape[0]):
+        x = pivot_distances[pairs[k, 0]]
+        y = pivot_distances[pairs[k, 1]]
+        lower_k = 0.0
+        upper_k = np.inf
+        for p in range(x.shape[0]):
+            lower_k = max(lower_k, abs(x[p] - y[p]))
+            upper_k = min(upper_k, x[p] + y[p])
+        lower[k] = lower_k
+        upper[k] = upper_k
+
+
+@dataclass
+class PivotBounds:
+    """Triangle-inequality bounds of all pair distances, derived from the pivot distances.
+
+    For a metric, ``max_p |d(x, p) - d(y, p)| <= d(x, y) <= min_p d(x, p) + d(y, p)``.
+    The bounds are not stored but computed on demand from the ``(n, n_pivots)`` matrix.
+    """
+    pivot_distances: np.ndarray
+
+    def bounds(self, pairs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        pairs = np.ascontiguousarray(pairs, dtype=np.int64).reshape(-1, 2)
+        lower = np.empty(pairs.shape[0], dtype=np.float64)
+        upper = np.empty(pairs.shape[0], dtype=np.float64)
+        _pivot_bounds(np.ascontiguousarray(self.pivot_distances, dtype=np.float64), pairs, lower, upper)
+        return lower, upper
+
+
+@njit(cache=True)
+def _close_pairs_sweep_count(points: np.ndarray, ends: np.ndarray, epsilon: float, out: np.ndarray) -> int:
+    k = 0
+    for a in range(points.shape[0]):
+        for b in range(a + 1, ends[a]):
+            close = True
+            for d in range(1, points.shape[1]):
+                if abs(points[a, d] - points[b, d]) > epsilon:
+                    close = False
+                    break
+            if close:
+                if out.shape[0] > 0:
+                    out[k, 0] = a
+                    out[k, 1] = b
+                k += 1
+    return k
+
+
+def _close_pairs_sweep(pivot_space: np.ndarray, epsilon: float) -> np.ndarray:
+    # sort by the first coordinate, so that all candidates of a point follow it within
+    # epsilon in the sort order; the remaining coordinates are checked one by one
+    order = np.argsort(pivot_space[:, 0], kind="stable")
+    points = np.ascontiguousarray(pivot_space[order], dtype=np.float64)
+    ends = np.searchsorted(points[:, 0], points[:, 0] + epsilon, side="right")
+    # count first, then fill the exactly sized result
+    k = _close_pairs_sweep_count(points, ends, epsilon, np.empty((0, 2), dtype=np.int64))
+    pairs = np.empty((k, 2), dtype=np.int64)
+    _close_pairs_sweep_count(points, ends, epsilon, pairs)
+    pairs = order[pairs]
+    pairs = np.stack((pairs.min(axis=1), pairs.max(axis=1)), axis=1)
+    return pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+
+
+def _bridge_pairs(pivot_space: np.ndarray, labels: np.ndarray, n_components: int, n_candidates: int) -> np.ndarray:
+    """Choose at most ``n_candidates`` links from every component to its closest components.
+
+    Each component is represented by its member closest to the component's centroid in
+    pivot space, and is linked to the representatives of the components with the
+    nearest centroids (Chebyshev distance). If these links do not connect all
+    components, the remaining groups are chained, so the number of links stays linear
+    in the number of components.
+    """
+    counts = np.bincount(labels, minlength=n_components)
+    centroids = np.zeros((n_components, pivot_space.shape[1]), dtype=np.float64)
+    np.add.at(centroids, labels, pivot_space)
+    centroids /= counts[:, None]
+    # representative: the member closest to the centroid of its component
+    centroid_distances = np.abs(pivot_space - centroids[labels]).max(axis=1)
+    order = np.lexsort((centroid_distances, labels))
+    representatives = order[np.concatenate(([0], np.cumsum(counts)[:-1]))]
+
+    k = min(n_candidates + 1, n_components)
+    _, neighbors = KDTree(centroids, metric="chebyshev").query(centroids, k=k)
+    a = np.repeat(np.arange(n_components), k - 1)
+    b = neighbors[:, 1:].reshape(-1)
+    a, b = a[a != b], b[a != b]
+    keys = np.unique(np.minimum(a, b) * n_components + np.maximum(a, b))
+    a, b = keys // n_components, keys % n_components
+
+    # chain the groups of components that the candidate links leave unconnected
+    component_graph = csr_matrix((np.ones(a.shape[0]), (a, b)), shape=(n_components, n_components))
+    n_groups, groups = connected_components(component_graph, directed=False)
+    if n_groups > 1:
+        _, group_heads = np.unique(groups, return_index=True)
+        group_heads = group_heads[np.argsort(centroids[group_heads, 0], kind="stable")]
+        a = np.concatenate((a, group_heads[:-1]))
+        b = np.concatenate((b, group_heads[1:]))
+    return np.stack((representatives[a], representatives[b]), axis=1)
+
+
+def _approximate_hierarchical_clustering(X: List[np.ndarray], distances: DistanceGraph, method: str, verbose: bool = False) -> np.ndarray:
+    n = len(X)
+    if method not in ("single", "complete", "average", "weighted", "centroid", "median", "ward"):
+        raise ValueError(f"Unknown method: {method}")
+    z_matrix = _sparse_linkage(
+        n, distances.u.astype(np.int64), distances.v.astype(np.int64), distances.distance.astype(np.float64), method
+    )
+    if z_matrix.shape[0] < n - 1:
+        raise ValueError(f"The distance graph is not connected, only {z_matrix.shape[0]} of {n - 1} merges possible")
+    return z_matrix
 
 
 @dataclass
@@ -119,10 +339,34 @@ class HappieClust(Clustering):
     n_pivots: int = 20
     s: float = 0.5
     m: float = 0.1
+    distance_cache: Optional[DistanceCache] = None
+    close_pairs_method: str = "kdtree"  # options: kdtree, sweep (Chebyshev sort-and-sweep)
+    close_pairs_max_bytes: Optional[int] = None  # memory cap of the KDTree close pairs, then the sweep is used
+    time_budget: Optional[float] = None  # wall-clock budget in seconds for the distance computations
+    anytime_initial_fraction: float = 0.5  # share of the budget for the initial graph in the anytime mode
+    anytime_n_batches: int = 10  # number of random pair batches to spend the remaining budget on
+    pivot_bounds: bool = False  # farthest-first pivots and triangle-inequality bounds (metric measures only)
+    bridge_candidates: int = 3  # links from each unconnected component to its closest components
 
     def __post_init__(self) -> None:
         super().__init__()
         self._rng = np.random.default_rng(self.random_state)
+        self._fingerprint: Optional[str] = None
+        # fraction of pairs to compute; smaller than m if the time budget does not suffice
+        self._m = self.m
+        self._start_time = 0.0
+        self._seconds_per_pair = 0.0
+        self._bounds: Optional[PivotBounds] = None
+        # keys of the pairs that the pivot bounds placed above the linkage threshold
+        self._far_keys = np.empty(0, dtype=np.int64)
+        if self.pivot_bounds and self.metric not in _metric_distances:
+            raise ValueError(f"Pivot bounds require a metric distance measure, but {self.metric} is not")
+
+    @property
+    def _cache_kwargs(self) -> dict:
+        if self.distance_cache is None:
+            return {}
+        return {"cache": self.distance_cache, "fingerprint": self._fingerprint}
 
     def _cluster_transform(self, X: List[np.ndarray], **kwargs: Any) -> np.ndarray:
         linkings = self._calculate_linkings(X)
@@ -140,35 +384,84 @@ class HappieClust(Clustering):
         pivots = self._rng.choice(len(X), self.n_pivots, replace=False).tolist()
         return pivots
 
+    def _choose_pivots_farthest_first(self, X: RaggedSeries) -> Tuple[List[int], np.ndarray]:
+        """Choose each next pivot as the series farthest from all previous pivots.
+
+        The pivots are spread over the dataset, which tightens the pivot bounds. Returns
+        the pivots and their distances, which are a by-product of the traversal.
+        """
+        n = len(X)
+        n_pivots = min(self.n_pivots, n)
+        # build the batched engine only once for all pivots
+        engine = None
+        if self.metric in distance_engines:
+            engine = distance_engines[self.metric].build(X, workers=self.n_jobs)
+        pivots = [int(self._rng.integers(n))]
+        pivot_distances = np.empty((n, n_pivots), dtype=np.float64)
+        nearest_pivot_distance = np.full(n, np.inf)
+        for k in range(n_pivots):
+            pairs = np.stack((np.arange(n), np.full(n, pivots[k])), axis=1)
+            pivot_distances[:, k] = distance_pairs(
+                X,
+                pairs,
+                distance_name=self.metric,
+                verbose=self.verbose,
+                n_jobs=self.n_jobs,
+                engine=engine,
+                **self._cache_kwargs,
+            )
+            np.minimum(nearest_pivot_distance, pivot_distances[:, k], out=nearest_pivot_distance)
+            if k + 1 < n_pivots:
+                pivots.append(int(np.argmax(nearest_pivot_distance)))
+        return pivots, pivot_distances
+
     def _estimate_epsilon(self, pivot_distances: np.ndarray) -> float:
         random_pairs = self._rng.choice(pivot_distances.shape[0], (pivot_distances.shape[0], 2))
         random_pairs = self._remove_self_pairs(random_pairs)
-        pseudo_distances = distance_pairs(
-            pivot_distances,
-            random_pairs,
-            distance_name="chebyshev",  # using Chebyshev distance for pivot distances
-            verbose=self.verbose,
-            n_jobs=self.n_jobs,
-        )
-        epsilon = np.quantile(pseudo_distances, self.s * self.m)
+        # using Chebyshev distance for pivot distances
+        pseudo_distances = np.abs(
+            pivot_distances[random_pairs[:, 0]] - pivot_distances[random_pairs[:, 1]]
+        ).max(axis=1)
+        epsilon = np.quantile(pseudo_distances, self.s * self._m)
 
         return epsilon
 
-    def _pairs_closer_than_epsilon(self, pivot_space: np.ndarray, epsilon: float) -> set[Tuple[int, int]]:
-        kd_tree = KDTree(pivot_space, metric="chebyshev")
-        neighbors = kd_tree.query_radius(pivot_space, epsilon)
-        pairs = {(i, j) for i, n in enumerate(neighbors) if len(n) > 0 for j in n if i < j}
-        return pairs
-
-    def _generate_graph(self, X: List[np.ndarray], pivots: List[int]) -> nx.Graph:
-        distance_graph = nx.Graph()
-        distance_graph.add_nodes_from(range(len(X)))
-        return distance_graph
-
-    def _calculate_pivot_distances(self, X: List[np.ndarray], pivots: List[int]) -> np.ndarray:
+    def _pairs_closer_than_epsilon(self, pivot_space: np.ndarray, epsilon: float) -> np.ndarray:
+        if self.close_pairs_method == "kdtree":
+            pairs = _close_pairs_kdtree(pivot_space, epsilon, self.close_pairs_max_bytes)
+            if pairs is not None:
+                return pairs
+            # the sweep counts the pairs first and only allocates the exactly sized result
+            warnings.warn(
+                f"The close pairs exceed close_pairs_max_bytes={self.close_pairs_max_bytes}, "
+                "falling back to the sort-and-sweep method",
+                RuntimeWarning,
+            )
+            return _close_pairs_sweep(pivot_space, epsilon)
+        elif self.close_pairs_method == "sweep":
+            return _close_pairs_sweep(pivot_space, epsilon)
+        else:
+            raise ValueError(f"Unknown close pairs method: {self.close_pairs_method}")
+
+    def _generate_graph(self, X: List[np.ndarray], pivots: List[int]) -> DistanceGraph:
+        return DistanceGraph(len(X))
+
+    def _calculate_pivot_distances(self, X: RaggedSeries, pivots: List[int]) -> np.ndarray:
+        if self.distance_cache is not None:
+            # the cache is keyed by index pairs of X
+            pairs = np.stack(np.meshgrid(np.arange(len(X)), pivots, indexing="ij"), axis=-1).reshape(-1, 2)
+            pivot_distances = distance_pairs(
+                X,
+                pairs,
+                distance_name=self.metric,
+                verbose=self.verbose,
+                n_jobs=self.n_jobs,
+                **self._cache_kwargs,
+            )
+            return pivot_distances.reshape(len(X), len(pivots))
         pivot_distances = matrix_other(
             X,
-            [X[p] for p in pivots],
+            X.take(pivots),
             distance_name=self.metric,
             verbose=self.verbose,
             n_jobs=self.n_jobs,
@@ -176,72 +469,257 @@ class HappieClust(Clustering):
         return pivot_distances
 
     def _calculate_distances_of_close_pairs(
-        self, X: List[np.ndarray], pivot_distances: np.ndarray, distance_graph: nx.Graph
-    ) -> nx.Graph:
+        self, X: List[np.ndarray], pivot_distances: np.ndarray, distance_graph: DistanceGraph
+    ) -> DistanceGraph:
         epsilon = self._estimate_epsilon(pivot_distances)
         close_pairs = self._pairs_closer_than_epsilon(pivot_distances, epsilon)
-        close_distances = distance_pairs(
-            X,
-            close_pairs,
-            distance_name=self.metric,
-            verbose=self.verbose,
-            n_jobs=self.n_jobs,
-        )
-        for (i, j), distance in zip(close_pairs, close_distances):
-            distance_graph.add_edge(i, j, distance=distance)
+        close_pairs, close_distances = self._compute_distances(X, close_pairs)
+        distance_graph.add_edges(close_pairs, close_distances)
         return distance_graph
 
-    def _calculate_distances_of_random_pairs(self, X: List[np.ndarray], distance_graph: nx.Graph) -> nx.Graph:
+    def _calculate_distances_of_random_pairs(
+        self, X: List[np.ndarray], distance_graph: DistanceGraph, threshold: float = np.inf
+    ) -> DistanceGraph:
         # calculate distances of additional random pairs
         n = len(X)
-        m = int(self.m * (n * (n - 1)) / 2)
+        m = int(self._m * (n * (n - 1)) / 2)
         random_pairs = self._rng.choice(len(X), (int((1 - self.s) * m), 2))
         random_pairs = self._remove_self_pairs(random_pairs)
-        random_distances = distance_pairs(
-            X,
-            random_pairs,
-            distance_name=self.metric,
-            verbose=self.verbose,
-            n_jobs=self.n_jobs,
-        )
-        distance_graph.remove_edges_from(random_pairs)
-        for (u, v), distance in zip(random_pairs, random_distances):
-            distance_graph.add_edge(u, v, distance=distance)
+        random_pairs, random_distances = self._compute_distances(X, random_pairs, threshold)
+        distance_graph.add_edges(random_pairs, random_distances)
         return distance_graph
 
-    def _connect_unconnected_components(self, X: List[np.ndarray], distance_graph: nx.Graph) -> nx.Graph:
-        # calculate distances between random nodes of unconnected components
-        nodes = [self._rng.choice(list(c)) for c in nx.connected_components(distance_graph)]
-        node_pairs = list(combinations(nodes, 2))
-
-        missing_distances = distance_pairs(
-            X,
-            node_pairs,
-            distance_name=self.metric,
-            verbose=self.verbose,
-            n_jobs=self.n_jobs,
-        )
-        for (u, v), distance in zip(node_pairs, missing_distances):
-            distance_graph.add_edge(u, v, distance=distance)
+    def _connect_unconnected_components(
+        self, X: List[np.ndarray], pivot_distances: np.ndarray, distance_graph: DistanceGraph
+    ) -> DistanceGraph:
+        # calculate distances between the closest components in pivot space
+        n_components, labels = distance_graph.connected_components()
+        if n_components == 1:
+            return distance_graph
+        node_pairs = _bridge_pairs(pivot_distances, labels, n_components, self.bridge_candidates)
+
+        node_pairs, missing_distances = self._compute_distances(X, node_pairs)
+        distance_graph.add_edges(node_pairs, missing_distances)
         return distance_graph
 
     def _calculate_linkings(self, X: List[np.ndarray]) -> np.ndarray:
-        pivots = self._choose_pivots(X)
+        distance_graph = self._calculate_distance_graph(X)
+        return self._calculate_linkage(X, distance_graph)
+
+    def _calculate_distance_graph(self, X: List[np.ndarray], budget_fraction: float = 1.0) -> DistanceGraph:
+        """Compute the sparse distance graph; it does not depend on the linkage method.
+
+        With a ``time_budget``, the per-pair cost is measured on the pivot distances and
+        the close and random pairs are reduced to fit ``budget_fraction`` of the budget.
+        With ``pivot_bounds``, the random pairs whose lower bound exceeds the
+        single-linkage cut of the graph so far are not computed (see `_bounds_threshold`).
+        """
+        self._start_time = time.perf_counter()
+        self._far_keys = np.empty(0, dtype=np.int64)
+        # pack the series once, all distance computations then share the same buffer
+        X = RaggedSeries.from_series(X)
+        if self.distance_cache is not None:
+            self._fingerprint = dataset_fingerprint(X)
+        t0 = time.perf_counter()
+        if self.pivot_bounds:
+            if np.unique(X.lengths).shape[0] > 1:
+                raise ValueError(f"Pivot bounds require series of equal length for {self.metric}")
+            pivots, pivot_distances = self._choose_pivots_farthest_first(X)
+            self._bounds = PivotBounds(pivot_distances)
+        else:
+            pivots = self._choose_pivots(X)
+            pivot_distances = self._calculate_pivot_distances(X, pivots)
         distance_graph = self._generate_graph(X, pivots)
-        pivot_distances = self._calculate_pivot_distances(X, pivots)
-        # print(f"edges: {distance_graph.number_of_edges()} after generation | {distance_graph.number_of_edges() / (len(X)*(len(X)-1)/2)}")
+        if self._bounds is not None:
+            # the distances to the pivots are known exactly
+            pivot_pairs = np.stack(np.meshgrid(np.arange(len(X)), pivots, indexing="ij"), axis=-1).reshape(-1, 2)
+            distance_graph.add_edges(pivot_pairs, pivot_distances.reshape(-1))
+        if self.time_budget is not None:
+            self._seconds_per_pair = (time.perf_counter() - t0) / max(1, len(X) * len(pivots))
+            self._m = self._budgeted_pair_fraction(len(X), self.time_budget * budget_fraction)
+        # print(f"edges: {distance_graph.n_edges} after generation | {distance_graph.n_edges / (len(X)*(len(X)-1)/2)}")
         distance_graph = self._calculate_distances_of_close_pairs(X, pivot_distances, distance_graph)
-        # print(f"edges: {distance_graph.number_of_edges()} after close pairs | {distance_graph.number_of_edges() / (len(X)*(len(X)-1)/2)}")
-        distance_graph = self._calculate_distances_of_random_pairs(X, distance_graph)
-        # print(f"edges: {distance_graph.number_of_edges()} after random pairs | {distance_graph.number_of_edges() / (len(X)*(len(X)-1)/2)}")
-        distance_graph = self._connect_unconnected_components(X, distance_graph)
-        # print(f"edges: {distance_graph.number_of_edges()} after connecting unconnected nodes | {distance_graph.number_of_edges() / (len(X)*(len(X)-1)/2)}")
+        # print(f"edges: {distance_graph.n_edges} after close pairs | {distance_graph.n_edges / (len(X)*(len(X)-1)/2)}")
+        # random pairs whose lower bound exceeds the cut of the graph so far are not computed
+        threshold = self._bounds_threshold(distance_graph)
+        distance_graph = self._calculate_distances_of_random_pairs(X, distance_graph, threshold)
+        # print(f"edges: {distance_graph.n_edges} after random pairs | {distance_graph.n_edges / (len(X)*(len(X)-1)/2)}")
+        distance_graph = self._connect_unconnected_components(X, pivot_distances, distance_graph)
+        # print(f"edges: {distance_graph.n_edges} after connecting unconnected nodes | {distance_graph.n_edges / (len(X)*(len(X)-1)/2)}")
+        return distance_graph
 
+    def _calculate_linkage(self, X: List[np.ndarray], distance_graph: DistanceGraph) -> np.ndarray:
+        """Merge the clusters along the distance graph using ``self.method``."""
         z_matrix = _approximate_hierarchical_clustering(X, distance_graph, self.method, self.verbose)
         return z_matrix
 
-    def _remove_self_pairs(self, pairs: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
-        return [(i, j) for i, j in pairs if i != j]
+    def _budgeted_pair_fraction(self, n: int, budget: float) -> float:
+        remaining = max(0.0, budget - (time.perf_counter() - self._start_time))
+        affordable_pairs = remaining / max(self._seconds_per_pair, 1e-12)
+        return min(self.m, affordable_pairs / (n * (n - 1) / 2))
+
+    def _sample_unknown_pairs(self, n: int, k: int, distance_graph: DistanceGraph) -> np.ndarray:
+        """Sample up to ``k`` distinct pairs whose distance is not in the graph yet."""
+        known_keys = distance_graph.keys
+        if self._far_keys.shape[0] > 0:
+            known_keys = np.union1d(known_keys, self._far_keys)
+        n_unknown = n * (n - 1) // 2 - known_keys.shape[0]
+        k = min(k, n_unknown)
+        if k <= 0:
+            return np.empty((0, 2), dtype=np.int64)
+        if 2 * k >= n_unknown:
+            # rejection sampling would mostly hit known pairs, enumerate the unknown ones instead
+            i, j = np.triu_indices(n, k=1)
+            keys = np.setdiff1d(i.astype(np.int64) * n + j, known_keys, assume_unique=True)
+            keys = self._rng.permutation(keys)[:k]
+            return np.stack((keys // n, keys % n), axis=1)
+        pairs = self._remove_self_pairs(self._rng.choice(n, (2 * k, 2)))
+        keys = np.unique(np.minimum(pairs[:, 0], pairs[:, 1]) * n + np.maximum(pairs[:, 0], pairs[:, 1]))
+        positions = np.minimum(np.searchsorted(known_keys, keys), max(0, known_keys.shape[0] - 1))
+        if known_keys.shape[0] > 0:
+            keys = keys[known_keys[positions] != keys]
+        keys = self._rng.permutation(keys)[:k]
+        return np.stack((keys // n, keys % n), axis=1)
+
+    def _calculate_linkings_anytime(self, X: List[np.ndarray]) -> Iterator[Tuple[np.ndarray, int, float]]:
+        """Yield increasingly refined linkages until the ``time_budget`` is used up.
+
+        The initial distance graph gets ``anytime_initial_fraction`` of the budget. The
+        rest is spent on ``anytime_n_batches`` batches of random unknown pairs; after
+        each batch, the linkage is recomputed. With ``pivot_bounds``, pairs whose lower
+        bound exceeds the height of the current ``n_clusters`` cut are skipped until the
+        cut rises above it. Yields the linkage matrix, the number of known distances, and
+        the elapsed seconds.
+        """
+        if self.time_budget is None:
+            raise ValueError("The anytime mode of HappieClust requires a time_budget.")
+        X = RaggedSeries.from_series(X)
+        n = len(X)
+        n_pairs = n * (n - 1) // 2
+        distance_graph = self._calculate_distance_graph(X, self.anytime_initial_fraction)
+        t0 = time.perf_counter()
+        z_matrix = self._calculate_linkage(X, distance_graph)
+        linkage_seconds = time.perf_counter() - t0
+        yield z_matrix, distance_graph.n_edges, time.perf_counter() - self._start_time
+
+        batch_seconds = self.time_budget * (1 - self.anytime_initial_fraction) / max(1, self.anytime_n_batches)
+        while distance_graph.n_edges + self._far_keys.shape[0] < n_pairs:
+            remaining = self.time_budget - (time.perf_counter() - self._start_time)
+            if remaining < linkage_seconds + self._seconds_per_pair:
+                break
+            threshold = self._linkage_threshold(z_matrix)
+            # the threshold of other linkages than single linkage can rise again
+            self._recheck_far_keys(n, threshold)
+            batch_size = int(min(batch_seconds, remaining - linkage_seconds) / max(self._seconds_per_pair, 1e-12))
+            # at most the pairs whose distance is still unknown
+            batch_size = min(max(1, batch_size), n_pairs - distance_graph.n_edges - self._far_keys.shape[0])
+            pairs = self._sample_unknown_pairs(n, batch_size, distance_graph)
+            if pairs.shape[0] == 0:
+                break
+            t0 = time.perf_counter()
+            pairs, distances = self._compute_distances(X, pairs, threshold)
+            if pairs.shape[0] == 0:
+                # the bounds placed the whole batch above the linkage threshold
+                continue
+            # refine the cost estimate with the actual batch
+            self._seconds_per_pair = (time.perf_counter() - t0) / pairs.shape[0]
+            distance_graph.add_edges(pairs, distances)
+
+            t0 = time.perf_counter()
+            z_matrix = self._calculate_linkage(X, distance_graph)
+            linkage_seconds = time.perf_counter() - t0
+            yield z_matrix, distance_graph.n_edges, time.perf_counter() - self._start_time
+
+    def _linkage_threshold(self, z_matrix: np.ndarray) -> float:
+        """Height below which the merges determine the ``n_clusters`` clusters."""
+        if self.n_clusters is None or z_matrix.shape[0] == 0:
+            return np.inf
+        n_merges = z_matrix.shape[0] + 1 - max(1, self.n_clusters)
+        if n_merges <= 0:
+            return 0.0
+        # the maximum, since centroid and median linkages are not monotonic
+        return float(z_matrix[:n_merges, 2].max())
+
+    def _bounds_threshold(self, distance_graph: DistanceGraph) -> float:
+        """Single-linkage height of the ``n_clusters`` cut of the graph (``inf`` without pivot bounds).
+
+        More edges only lower the single-linkage merges, so a pair whose lower bound
+        exceeds this height cannot change the ``n_clusters`` single-linkage clusters. As
+        the graph does not depend on the linkage method, this threshold is also used for
+        the other linkages, where the pruned pairs only approximately do not matter.
+        """
+        if self._bounds is None or self.n_clusters is None:
+            return np.inf
+        z_matrix = _sparse_linkage(
+            distance_graph.n,
+            distance_graph.u.astype(np.int64),
+            distance_graph.v.astype(np.int64),
+            distance_graph.distance.astype(np.float64),
+            "single",
+        )
+        if z_matrix.shape[0] < distance_graph.n - 1:
+            return np.inf
+        return self._linkage_threshold(z_matrix)
+
+    def _recheck_far_keys(self, n: int, threshold: float) -> None:
+        """Release the pairs that are no longer above ``threshold``, so that they can be sampled again."""
+        if self._bounds is None or self._far_keys.shape[0] == 0:
+            return
+        lower, _ = self._bounds.bounds(np.stack((self._far_keys // n, self._far_keys % n), axis=1))
+        self._far_keys = self._far_keys[lower > threshold]
+
+    def _compute_distances(
+        self, X: RaggedSeries, pairs: np.ndarray, threshold: float = np.inf
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Compute the distances of the pairs, unless the pivot bounds decide them.
+
+        A pair is decided if its bounds coincide (always for pairs with a pivot), or if
+        its lower bound exceeds ``threshold``: the pair cannot be merged before the
+        linkage threshold (exactly for single linkage), so it is left out of the graph.
+        Returns the kept pairs and their distances.
+        """
+        pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+        if self._bounds is None:
+            return pairs, distance_pairs(
+                X,
+                pairs,
+                distance_name=self.metric,
+                verbose=self.verbose,
+                n_jobs=self.n_jobs,
+                **self._cache_kwargs,
+            )
+        lower, upper = self._bounds.bounds(pairs)
+        # crossed bounds (rounding) never decide a pair
+        far = (lower > threshold) & (lower <= upper)
+        if far.any():
+            far_pairs = np.sort(pairs[far], axis=1)
+            self._far_keys = np.union1d(self._far_keys, far_pairs[:, 0] * len(X) + far_pairs[:, 1])
+            pairs, lower, upper = pairs[~far], lower[~far], upper[~far]
+        exact = lower == upper
+        distances = upper.copy()
+        distances[~exact] = distance_pairs(
+            X,
+            pairs[~exact],
+            distance_name=self.metric,
+            verbose=self.verbose,
+            n_jobs=self.n_jobs,
+            **self._cache_kwargs,
+        )
+        return pairs, distances
+
+    def _remove_self_pairs(self, pairs: np.ndarray) -> np.ndarray:
+        return pairs[pairs[:, 0] != pairs[:, 1]]
+
+
+def warmup_kernels() -> None:
+    """Compile (or load from the numba cache) the kernels of HappieClust before any timed region."""
+    distance_graph = DistanceGraph(3)
+    distance_graph.add_edges(np.array([[0, 1], [1, 2], [0, 2]]), np.array([1.0, 2.0, 3.0]))
+    # the method is a runtime argument, so one call compiles all linkages
+    _approximate_hierarchical_clustering([np.zeros(1)] * 3, distance_graph, "single")
+    pivot_space = np.random.default_rng(0).random((8, 2))
+    _close_pairs_sweep(pivot_space, 0.5)
+    PivotBounds(pivot_space).bounds(np.array([[0, 1]]))
 
 
 def _test_happieclust():
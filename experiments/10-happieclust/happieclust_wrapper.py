@@ -1,48 +1,159 @@
 #!/usr/bin/env python
+import sys
 import time
+from pathlib import Path
+from typing import Any, NamedTuple
 
 import numpy as np
-from aeon.datasets import load_classification, load_from_ts_file
 from sklearn.metrics import adjusted_rand_score
 
-from happieclust import HappieClust
+from happieclust import DistanceGraph, HappieClust, warmup_kernels
 
-
-def _load_edeniss_dataset(dataset, data_folder):
-    path = f"{data_folder}/edeniss20182020_anomalies/{dataset}.ts"
-    return load_from_ts_file(path)
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from distances import DistanceCache, warmup
+from download_datasets import load_cached_dataset
 
 
 def load_dataset(dataset, data_folder):
-    if dataset.startswith("edeniss"):
-        X, y = _load_edeniss_dataset(dataset, data_folder)
-    else:
-        X, y = load_classification(
-            dataset, extract_path=data_folder, load_equal_length=False
-        )
+    # we support only univariate time series (stored flattened in the dataset cache)
+    X, y = load_cached_dataset(dataset, data_folder)
     n_clusters = len(np.unique(y))
-    # we support only univariate time series
-    X = [x.ravel() for x in X]
     return X, y, n_clusters
 
 
-def run_happieclust(dataset, distance, linkage, n_jobs, data_folder):
+class HappieClustGraph(NamedTuple):
+    happieclust: HappieClust
+    X: Any
+    y: np.ndarray
+    distance_graph: DistanceGraph
+    runtime: int
+
+
+def run_happieclust(
+    dataset,
+    distance,
+    linkage,
+    n_jobs,
+    data_folder,
+    use_cache=False,
+    time_budget=None,
+    close_pairs_max_bytes=None,
+    pivot_bounds=False,
+):
+    (_, h, graph_runtime, linkage_runtime, ari), = run_happieclust_linkages(
+        dataset, distance, [linkage], n_jobs, data_folder, use_cache, time_budget, close_pairs_max_bytes, pivot_bounds
+    )
+    return h, graph_runtime + linkage_runtime, ari
+
+
+def run_happieclust_linkages(
+    dataset,
+    distance,
+    linkages,
+    n_jobs,
+    data_folder,
+    use_cache=False,
+    time_budget=None,
+    close_pairs_max_bytes=None,
+    pivot_bounds=False,
+):
+    """Compute the distance graph once and the hierarchies of all linkages from it.
+
+    Yields ``(linkage, hierarchy, graph_runtime, linkage_runtime, ari)`` per linkage;
+    the runtimes are in milliseconds.
+    """
+    graph = compute_happieclust_graph(
+        dataset, distance, n_jobs, data_folder, use_cache, time_budget, close_pairs_max_bytes, pivot_bounds
+    )
+    for linkage in linkages:
+        h, linkage_runtime, ari = compute_happieclust_linkage(graph, linkage)
+        yield linkage, h, graph.runtime, linkage_runtime, ari
+
+
+def compute_happieclust_graph(
+    dataset,
+    distance,
+    n_jobs,
+    data_folder,
+    use_cache=False,
+    time_budget=None,
+    close_pairs_max_bytes=None,
+    pivot_bounds=False,
+):
+    """Compute the distance graph, which does not depend on the linkage.
+
+    The runtime of the returned `HappieClustGraph` is in milliseconds.
+    """
     verbose = False
 
     X, y, n_clusters = load_dataset(dataset, data_folder)
+    # compile the distance and linkage kernels outside of the measured runtime
+    warmup([distance])
+    warmup_kernels()
     t0 = time.time()
     happieclust = HappieClust(
         n_clusters=n_clusters,
         n_jobs=n_jobs,
-        method=linkage,
         metric=distance,
         verbose=verbose,
         random_state=42,
+        distance_cache=DistanceCache() if use_cache else None,
+        time_budget=time_budget,
+        close_pairs_max_bytes=close_pairs_max_bytes,
+        pivot_bounds=pivot_bounds,
     )
-    h = happieclust._calculate_linkings(X)
+    distance_graph = happieclust._calculate_distance_graph(X)
     t1 = time.time()
+    return HappieClustGraph(happieclust, X, y, distance_graph, int((t1 - t0) * 1000))
+
 
-    runtime = int((t1 - t0) * 1000)
-    ari = adjusted_rand_score(y, happieclust._cut_tree(h, X))
+def compute_happieclust_linkage(graph, linkage):
+    """Compute the hierarchy of one linkage from a `HappieClustGraph`.
 
-    return h, runtime, ari
+    Returns ``(hierarchy, linkage_runtime, ari)``; the runtime is in milliseconds.
+    """
+    happieclust = graph.happieclust
+    happieclust.method = linkage
+    t0 = time.time()
+    h = happieclust._calculate_linkage(graph.X, graph.distance_graph)
+    t1 = time.time()
+
+    linkage_runtime = int((t1 - t0) * 1000)
+    ari = adjusted_rand_score(graph.y, happieclust._cut_tree(h, graph.X))
+    return h, linkage_runtime, ari
+
+
+def run_happieclust_anytime(
+    dataset,
+    distance,
+    linkage,
+    n_jobs,
+    data_folder,
+    time_budget,
+    use_cache=False,
+    close_pairs_max_bytes=None,
+    pivot_bounds=False,
+):
+    """Refine the hierarchy with random distance batches until ``time_budget`` is used up.
+
+    Yields ``(batch, hierarchy, n_edges, runtime, ari)`` per batch, starting with the
+    hierarchy of the initial distance graph as batch 0; the runtime is in milliseconds.
+    """
+    X, y, n_clusters = load_dataset(dataset, data_folder)
+    warmup([distance])
+    warmup_kernels()
+    happieclust = HappieClust(
+        n_clusters=n_clusters,
+        n_jobs=n_jobs,
+        metric=distance,
+        method=linkage,
+        verbose=False,
+        random_state=42,
+        distance_cache=DistanceCache() if use_cache else None,
+        time_budget=time_budget,
+        close_pairs_max_bytes=close_pairs_max_bytes,
+        pivot_bounds=pivot_bounds,
+    )
+    for batch, (h, n_edges, elapsed) in enumerate(happieclust._calculate_linkings_anytime(X)):
+        ari = adjusted_rand_score(y, happieclust._cut_tree(h, X))
+        yield batch, h, n_edges, int(elapsed * 1000), ari
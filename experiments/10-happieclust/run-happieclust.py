@@ -13,7 +13,7 @@ sys.path.append(str(Path(__file__).resolve().parent.parent))
 from download_datasets import DATA_FOLDER
 from plt_commons import linkages, distances
 
-from happieclust_wrapper import run_happieclust
+from happieclust_wrapper import run_happieclust, run_happieclust_anytime
 
 RESULT_FOLDER = Path("results")
 DEFAULT_N_JOBS = check_n_jobs(psutil.cpu_count(logical=False))
@@ -51,11 +51,56 @@ def parse_args(args):
         default=DEFAULT_N_JOBS,
         help="Number of jobs to use for parallel processing",
     )
-    return parser.parse_args(args)
-
-
-
-def main(data_folder, result_path, dataset, distance, linkage, n_jobs):
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Reuse (and fill) the shared distance cache; the runtime then excludes cached distances",
+    )
+    parser.add_argument(
+        "--time-budget",
+        type=float,
+        help="Wall-clock budget in seconds for the distance computations; reduces the number of pairs "
+             "if the budget does not suffice",
+    )
+    parser.add_argument(
+        "--close-pairs-max-bytes",
+        type=int,
+        help="Memory cap in bytes for the close pairs found with the KDTree; if they exceed it, a "
+             "warning is printed and the slower sort-and-sweep search, which allocates only the "
+             "exactly sized result, is used instead (default: no cap)",
+    )
+    parser.add_argument(
+        "--pivot-bounds",
+        action="store_true",
+        help="Choose the pivots farthest-first and skip the pairs that the triangle-inequality bounds "
+             "place above the single-linkage cut (euclidean, lorentzian, and chebyshev on series of "
+             "equal length only)",
+    )
+    parser.add_argument(
+        "--anytime",
+        action="store_true",
+        help="Spend the time budget in batches of random pairs and store the hierarchy and the ARI "
+             "after each batch (requires --time-budget)",
+    )
+    args = parser.parse_args(args)
+    if args.anytime and args.time_budget is None:
+        parser.error("--anytime requires --time-budget")
+    return args
+
+
+
+def main(
+    data_folder,
+    result_path,
+    dataset,
+    distance,
+    linkage,
+    n_jobs,
+    use_cache=False,
+    time_budget=None,
+    close_pairs_max_bytes=None,
+    pivot_bounds=False,
+):
     print(f"Using {n_jobs} jobs")
 
     try:
@@ -65,6 +110,10 @@ def main(data_folder, result_path, dataset, distance, linkage, n_jobs):
             linkage=linkage,
             n_jobs=n_jobs,
             data_folder=data_folder,
+            use_cache=use_cache,
+            time_budget=time_budget,
+            close_pairs_max_bytes=close_pairs_max_bytes,
+            pivot_bounds=pivot_bounds,
         )
         print(
             f"HappieClust took {runtime:.2f} seconds to process {dataset} with {distance} - {linkage}: "
@@ -79,6 +128,41 @@ def main(data_folder, result_path, dataset, distance, linkage, n_jobs):
         raise e
 
 
+def main_anytime(
+    data_folder,
+    result_path,
+    dataset,
+    distance,
+    linkage,
+    n_jobs,
+    time_budget,
+    use_cache=False,
+    close_pairs_max_bytes=None,
+    pivot_bounds=False,
+):
+    print(f"Using {n_jobs} jobs")
+
+    quality_path = result_path.parent.parent / f"anytime-{dataset}-{distance}-{linkage}.csv"
+    with quality_path.open("w") as fh:
+        fh.write("batch,n_edges,runtime,ARI\n")
+        for batch, h, n_edges, runtime, ari in run_happieclust_anytime(
+            dataset=dataset,
+            distance=distance,
+            linkage=linkage,
+            n_jobs=n_jobs,
+            data_folder=data_folder,
+            time_budget=time_budget,
+            use_cache=use_cache,
+            close_pairs_max_bytes=close_pairs_max_bytes,
+            pivot_bounds=pivot_bounds,
+        ):
+            print(f"Batch {batch}: {n_edges} distances after {runtime} ms, {ari=:.2f}")
+            np.savetxt(result_path.with_name(f"{result_path.stem}-batch{batch}.csv"), h, delimiter=",")
+            fh.write(f"{batch},{n_edges},{runtime},{ari}\n")
+            fh.flush()
+    print(f"Stored the hierarchies next to {result_path} and the ARI per batch at {quality_path}")
+
+
 if __name__ == "__main__":
     args = parse_args(sys.argv[1:])
     data_folder = args.datafolder if args.datafolder else DATA_FOLDER
@@ -90,4 +174,29 @@ if __name__ == "__main__":
     result_path = RESULT_FOLDER / "hierarchies" / f"hierarchy-{dataset}-{distance}-{linkage}.csv"
     result_path.parent.mkdir(exist_ok=True, parents=True)
 
-    main(data_folder, result_path, dataset, distance, linkage, n_jobs)
+    if args.anytime:
+        main_anytime(
+            data_folder,
+            result_path,
+            dataset,
+            distance,
+            linkage,
+            n_jobs,
+            args.time_budget,
+            args.cache,
+            args.close_pairs_max_bytes,
+            args.pivot_bounds,
+        )
+    else:
+        main(
+            data_folder,
+            result_path,
+            dataset,
+            distance,
+            linkage,
+            n_jobs,
+            args.cache,
+            args.time_budget,
+            args.close_pairs_max_bytes,
+            args.pivot_bounds,
+        )
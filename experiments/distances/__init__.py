@@ -0,0 +1,63 @@
+"""Shared distance measures of the Python baselines (HappieClust and JET).
+
+The numba kernels are compiled once per process (and cached on disk); call `warmup`
+before any timed region to compile all signatures up front.
+"""
+from .bounds import EnvelopeIndex
+from .cache import DistanceCache, dataset_fingerprint, file_fingerprint
+from .engines import CachedKDTW, KDTWEngine, SBDEngine, distance_engines
+from .kernels import (
+    chebyshev_distance,
+    dtw_distance,
+    euclidean_distance,
+    kdtw_distance,
+    lorentzian_distance,
+    msm_distance,
+    sbd_distance,
+)
+from .pairwise import distance_pairs, matrix_other, pdist
+from .ragged import RaggedSeries, series_length, series_view
+from .registry import (
+    distance_defaults,
+    distance_functions,
+    get_distance_function,
+    measure_ids,
+    measure_params,
+    pair_distance,
+)
+from .snippets import approximate_pdist, extract_snippets, snippet_strategies
+from .warmup import warmup
+
+__all__ = [
+    "CachedKDTW",
+    "DistanceCache",
+    "EnvelopeIndex",
+    "KDTWEngine",
+    "RaggedSeries",
+    "SBDEngine",
+    "approximate_pdist",
+    "chebyshev_distance",
+    "dataset_fingerprint",
+    "distance_defaults",
+    "distance_engines",
+    "distance_functions",
+    "distance_pairs",
+    "dtw_distance",
+    "euclidean_distance",
+    "extract_snippets",
+    "file_fingerprint",
+    "get_distance_function",
+    "kdtw_distance",
+    "lorentzian_distance",
+    "matrix_other",
+    "measure_ids",
+    "measure_params",
+    "msm_distance",
+    "pair_distance",
+    "pdist",
+    "sbd_distance",
+    "series_length",
+    "series_view",
+    "snippet_strategies",
+    "warmup",
+]
@@ -0,0 +1,50 @@
+"""Helpers to pack time series and split batches of pairs into balanced chunks."""
+from typing import Iterable, List, Tuple, Union
+
+import numpy as np
+
+from .ragged import RaggedSeries, SeriesLike
+
+# measures whose cost grows linearly with the (shorter) series length; all others are
+# treated as quadratic (elastic) measures when balancing the work chunks
+_lockstep_distances = {"euclidean", "lorentzian", "chebyshev"}
+# number of chunks per worker; more chunks improve load balancing for skewed costs
+_chunks_per_worker = 4
+_min_chunk_size = 64
+_column_tile_size = 16
+
+
+def _as_pair_array(pairs: Union[Iterable[Tuple[int, int]], np.ndarray]) -> np.ndarray:
+    if isinstance(pairs, np.ndarray):
+        return np.ascontiguousarray(pairs, dtype=np.int32).reshape(-1, 2)
+    return np.array(list(pairs), dtype=np.int32).reshape(-1, 2)
+
+
+def _pack_series(series: SeriesLike) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Pack the (univariate) time series into one contiguous buffer with offsets.
+
+    A float64 `RaggedSeries` is used as is (without copying).
+    """
+    ragged = RaggedSeries.from_series(series)
+    return ragged.values, ragged.offsets, ragged.lengths
+
+
+def _pair_costs(lengths: np.ndarray, pairs: np.ndarray, distance_name: str) -> np.ndarray:
+    len_i = lengths[pairs[:, 0]].astype(np.float64)
+    len_j = lengths[pairs[:, 1]].astype(np.float64)
+    if distance_name in _lockstep_distances:
+        return np.minimum(len_i, len_j)
+    return len_i * len_j
+
+
+def _balanced_chunks(
+    costs: np.ndarray, n_chunks: int, min_size: int = _min_chunk_size
+) -> List[Tuple[int, int]]:
+    """Split the items into at most `n_chunks` contiguous ranges of similar total cost."""
+    k = costs.shape[0]
+    n_chunks = max(1, min(n_chunks, k // min_size))
+    cumulative_costs = np.cumsum(costs)
+    targets = cumulative_costs[-1] * np.arange(1, n_chunks) / n_chunks
+    bounds = np.concatenate(([0], np.searchsorted(cumulative_costs, targets), [k]))
+    bounds = np.unique(bounds)
+    return [(int(s), int(e)) for s, e in zip(bounds[:-1], bounds[1:])]
@@ -0,0 +1,148 @@
+"""Lower bounds of the elastic distance measures for pruning."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Optional, Tuple
+
+import numpy as np
+from numba import njit
+
+from .batching import _as_pair_array, _pack_series
+from .ragged import SeriesLike
+from .registry import distance_defaults
+
+
+@njit(cache=True)
+def _envelopes(
+    values: np.ndarray, offsets: np.ndarray, window: Optional[float]
+) -> Tuple[np.ndarray, np.ndarray]:
+    upper = np.empty_like(values)
+    lower = np.empty_like(values)
+    for s in range(offsets.shape[0] - 1):
+        x = values[offsets[s]:offsets[s + 1]]
+        n = x.shape[0]
+        # same band radius as the Sakoe-Chiba band for equal-length series
+        radius = int(np.floor(window * n)) if window is not None else n
+        for i in range(n):
+            start = max(0, i - radius)
+            stop = min(n, i + radius + 1)
+            upper[offsets[s] + i] = np.max(x[start:stop])
+            lower[offsets[s] + i] = np.min(x[start:stop])
+    return upper, lower
+
+
+@njit(cache=True, nogil=True)
+def _lb_kim_pairs(
+    values: np.ndarray, offsets: np.ndarray, pairs: np.ndarray, squared: bool, constant: float
+) -> np.ndarray:
+    bounds = np.empty(pairs.shape[0])
+    for k in range(pairs.shape[0]):
+        i_start, i_end = offsets[pairs[k, 0]], offsets[pairs[k, 0] + 1]
+        j_start, j_end = offsets[pairs[k, 1]], offsets[pairs[k, 1] + 1]
+        if i_start == i_end or j_start == j_end:
+            bounds[k] = 0.0
+            continue
+        # the first and the last cell are part of every warping path
+        first = values[i_start] - values[j_start]
+        last = values[i_end - 1] - values[j_end - 1]
+        single_cell = i_end - i_start == 1 and j_end - j_start == 1
+        if squared:
+            bounds[k] = first * first + (0.0 if single_cell else last * last)
+        else:
+            # MSM reaches the last cell by a move (|last|) or a split/merge (>= c)
+            bounds[k] = np.abs(first) + (0.0 if single_cell else min(np.abs(last), constant))
+    return bounds
+
+
+@njit(cache=True)
+def _lb_keogh_one(
+    x: np.ndarray, upper: np.ndarray, lower: np.ndarray, squared: bool, constant: float
+) -> float:
+    bound = 0.0
+    for i in range(x.shape[0]):
+        if x[i] > upper[i]:
+            diff = x[i] - upper[i]
+        elif x[i] < lower[i]:
+            diff = lower[i] - x[i]
+        else:
+            continue
+        if squared:
+            bound += diff * diff
+        else:
+            # MSM enters every column by a move (>= diff) or a merge (>= c)
+            bound += min(diff, constant)
+    return bound
+
+
+@njit(cache=True, nogil=True)
+def _lb_keogh_pairs(
+    values: np.ndarray,
+    offsets: np.ndarray,
+    upper: np.ndarray,
+    lower: np.ndarray,
+    pairs: np.ndarray,
+    squared: bool,
+    constant: float,
+) -> np.ndarray:
+    bounds = np.zeros(pairs.shape[0])
+    for k in range(pairs.shape[0]):
+        i_start, i_end = offsets[pairs[k, 0]], offsets[pairs[k, 0] + 1]
+        j_start, j_end = offsets[pairs[k, 1]], offsets[pairs[k, 1] + 1]
+        # the envelopes are only valid for series of equal length
+        if i_end - i_start != j_end - j_start:
+            continue
+        bounds[k] = max(
+            _lb_keogh_one(
+                values[i_start:i_end], upper[j_start:j_end], lower[j_start:j_end], squared, constant
+            ),
+            _lb_keogh_one(
+                values[j_start:j_end], upper[i_start:i_end], lower[i_start:i_end], squared, constant
+            ),
+        )
+    return bounds
+
+
+@dataclass
+class EnvelopeIndex:
+    """Precomputed per-series envelopes to lower-bound the DTW and MSM distances.
+
+    Build it once per dataset and window with `EnvelopeIndex.build` and reuse it for
+    all batches of pairs.
+    """
+    values: np.ndarray
+    offsets: np.ndarray
+    upper: np.ndarray
+    lower: np.ndarray
+    window: Optional[float] = None
+
+    @classmethod
+    def build(
+        cls, series: SeriesLike, window: Optional[float] = None
+    ) -> EnvelopeIndex:
+        values, offsets, _ = _pack_series(series)
+        upper, lower = _envelopes(values, offsets, window)
+        return cls(values, offsets, upper, lower, window)
+
+    def lb_kim(self, pairs: np.ndarray, distance_name: str = "dtw", constant: float = 0.5) -> np.ndarray:
+        return _lb_kim_pairs(self.values, self.offsets, _as_pair_array(pairs), distance_name == "dtw", constant)
+
+    def lb_keogh(self, pairs: np.ndarray, distance_name: str = "dtw", constant: float = 0.5) -> np.ndarray:
+        return _lb_keogh_pairs(
+            self.values,
+            self.offsets,
+            self.upper,
+            self.lower,
+            _as_pair_array(pairs),
+            distance_name == "dtw",
+            constant,
+        )
+
+    def lower_bounds(self, pairs: np.ndarray, distance_name: str, **params: Any) -> np.ndarray:
+        """Compute the tightest available lower bound of the distance for each pair."""
+        if distance_name == "dtw":
+            return np.maximum(self.lb_kim(pairs, "dtw"), self.lb_keogh(pairs, "dtw"))
+        elif distance_name == "msm":
+            constant = params.get("constant", distance_defaults["msm"]["constant"])
+            return np.maximum(self.lb_kim(pairs, "msm", constant), self.lb_keogh(pairs, "msm", constant))
+        else:
+            raise ValueError(f"No lower bound available for the {distance_name} distance")
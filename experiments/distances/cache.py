@@ -0,0 +1,219 @@
+"""Content-addressed on-disk cache for pairwise distances with an LRU size limit."""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .ragged import RaggedSeries, SeriesLike
+
+DEFAULT_CACHE_FOLDER = Path(__file__).resolve().parent.parent.parent / "data" / "distance-cache"
+DEFAULT_MAX_BYTES = 16 * 1024**3
+# the sparse pair blocks of an entry are merged once there are more than this many
+_max_pair_blocks = 16
+
+
+def dataset_fingerprint(series: SeriesLike) -> str:
+    """Hash the values and lengths of the (univariate) time series of a dataset."""
+    ragged = RaggedSeries.from_series(series)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(ragged.lengths.tobytes())
+    h.update(ragged.values.tobytes())
+    return h.hexdigest()
+
+
+def file_fingerprint(path: Union[str, Path]) -> str:
+    """Hash the contents of a file, e.g., of a distance matrix exported by DendroTime."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _pair_keys(pairs: np.ndarray, n: int) -> np.ndarray:
+    i = np.minimum(pairs[:, 0], pairs[:, 1]).astype(np.int64)
+    j = np.maximum(pairs[:, 0], pairs[:, 1]).astype(np.int64)
+    return i * n + j
+
+
+class DistanceCache:
+    """Cache of distances keyed by dataset fingerprint, measure name, and measure parameters.
+
+    An entry is a folder below ``root`` that holds either a condensed ``float32``
+    distance matrix (``condensed.npy``, see `scipy.spatial.distance.squareform`) or
+    blocks of sparse pairs (``keys-*.npy`` with the sorted packed pair keys
+    ``i * n + j`` for ``i < j`` and ``values-*.npy`` with their distances). All
+    arrays are memory-mapped on read. Reading an entry marks it as recently used;
+    whenever an entry is written, the least recently used entries are evicted until
+    the cache is at most ``max_bytes`` large.
+
+    The cache folder and size limit can be changed with the environment variables
+    ``DISTANCE_CACHE_FOLDER`` and ``DISTANCE_CACHE_MAX_BYTES``.
+    """
+
+    def __init__(self, root: Optional[Union[str, Path]] = None, max_bytes: Optional[int] = None) -> None:
+        self.root = Path(root or os.environ.get("DISTANCE_CACHE_FOLDER", DEFAULT_CACHE_FOLDER))
+        self.max_bytes = int(max_bytes or os.environ.get("DISTANCE_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES))
+
+    @staticmethod
+    def key(fingerprint: str, distance_name: str, params: Optional[Dict[str, Any]] = None) -> str:
+        description = json.dumps(
+            {"dataset": fingerprint, "distance": distance_name, "params": params or {}},
+            sort_keys=True,
+            default=str,
+        )
+        return f"{distance_name}-{hashlib.blake2b(description.encode(), digest_size=16).hexdigest()}"
+
+    def _entry(self, key: str) -> Path:
+        return self.root / key
+
+    def _touch(self, entry: Path) -> None:
+        now = time.time()
+        os.utime(entry, (now, now))
+
+    def _save(self, entry: Path, name: str, array: np.ndarray) -> None:
+        # write to a temporary file first, so that readers never see partial files
+        entry.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=entry, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fh:
+            np.save(fh, array)
+        os.replace(tmp, entry / name)
+
+    # condensed matrices
+
+    def get_condensed(self, key: str) -> Optional[np.ndarray]:
+        path = self._entry(key) / "condensed.npy"
+        if not path.exists():
+            return None
+        self._touch(path.parent)
+        return np.load(path, mmap_mode="r")
+
+    def put_condensed(self, key: str, condensed: np.ndarray) -> None:
+        entry = self._entry(key)
+        self._save(entry, "condensed.npy", np.asarray(condensed, dtype=np.float32).reshape(-1))
+        self._touch(entry)
+        self.evict()
+
+    def condensed(
+        self,
+        fingerprint: str,
+        distance_name: str,
+        params: Optional[Dict[str, Any]],
+        compute: Callable[[], np.ndarray],
+    ) -> np.ndarray:
+        """Load the condensed distance matrix or compute and store it.
+
+        ``compute`` may return a condensed vector or a square distance matrix.
+        """
+        key = self.key(fingerprint, distance_name, params)
+        condensed = self.get_condensed(key)
+        if condensed is None:
+            dists = np.asarray(compute())
+            if dists.ndim == 2:
+                dists = dists[np.triu_indices(dists.shape[0], k=1)]
+            self.put_condensed(key, dists)
+            # the entry is already evicted again if it alone exceeds the size limit
+            condensed = self.get_condensed(key)
+            if condensed is None:
+                condensed = dists.astype(np.float32)
+        return condensed
+
+    # sparse pair blocks
+
+    def _pair_blocks(self, entry: Path) -> List[Tuple[np.ndarray, np.ndarray]]:
+        blocks = []
+        for keys_path in sorted(entry.glob("keys-*.npy")):
+            values_path = entry / keys_path.name.replace("keys-", "values-")
+            if values_path.exists():
+                blocks.append((np.load(keys_path, mmap_mode="r"), np.load(values_path, mmap_mode="r")))
+        return blocks
+
+    def get_pairs(self, key: str, pairs: np.ndarray, n: int) -> np.ndarray:
+        """Look up the distances of the pairs of a dataset with ``n`` series.
+
+        Missing pairs get ``nan``. Falls back to the condensed matrix if there is one.
+        """
+        pairs = np.asarray(pairs).reshape(-1, 2)
+        result = np.full(pairs.shape[0], np.nan, dtype=np.float64)
+        entry = self._entry(key)
+        if not entry.exists() or pairs.shape[0] == 0:
+            return result
+
+        condensed = self.get_condensed(key)
+        if condensed is not None:
+            i = np.minimum(pairs[:, 0], pairs[:, 1]).astype(np.int64)
+            j = np.maximum(pairs[:, 0], pairs[:, 1]).astype(np.int64)
+            off_diagonal = i != j
+            i, j = i[off_diagonal], j[off_diagonal]
+            # index of (i, j) in the condensed vector
+            result[off_diagonal] = condensed[n * i - i * (i + 1) // 2 + j - i - 1]
+            result[~off_diagonal] = 0.0
+            return result
+
+        keys = _pair_keys(pairs, n)
+        for block_keys, block_values in self._pair_blocks(entry):
+            positions = np.searchsorted(block_keys, keys)
+            positions[positions == block_keys.shape[0]] = 0
+            found = block_keys[positions] == keys
+            result[found] = block_values[positions[found]]
+        self._touch(entry)
+        return result
+
+    def put_pairs(self, key: str, pairs: np.ndarray, values: np.ndarray, n: int) -> None:
+        pairs = np.asarray(pairs).reshape(-1, 2)
+        if pairs.shape[0] == 0:
+            return
+        entry = self._entry(key)
+        keys, unique_idx = np.unique(_pair_keys(pairs, n), return_index=True)
+        values = np.asarray(values, dtype=np.float32)[unique_idx]
+
+        blocks = self._pair_blocks(entry) if entry.exists() else []
+        if len(blocks) >= _max_pair_blocks:
+            # merge all blocks into one to keep the lookups cheap
+            keys = np.concatenate([k for k, _ in blocks] + [keys])
+            values = np.concatenate([v for _, v in blocks] + [values])
+            keys, unique_idx = np.unique(keys, return_index=True)
+            values = values[unique_idx]
+            for keys_path in entry.glob("keys-*.npy"):
+                keys_path.unlink()
+                (entry / keys_path.name.replace("keys-", "values-")).unlink(missing_ok=True)
+        name = f"{time.time_ns():d}.npy"
+        # write the values first, a block only counts once its keys file exists
+        self._save(entry, f"values-{name}", values)
+        self._save(entry, f"keys-{name}", keys)
+        self._touch(entry)
+        self.evict()
+
+    # eviction
+
+    def size(self) -> int:
+        if not self.root.exists():
+            return 0
+        return sum(f.stat().st_size for f in self.root.glob("*/*.npy"))
+
+    def evict(self) -> None:
+        """Remove the least recently used entries until the cache fits into ``max_bytes``."""
+        if not self.root.exists():
+            return
+        entries = []
+        for entry in self.root.iterdir():
+            if entry.is_dir():
+                size = sum(f.stat().st_size for f in entry.glob("*.npy"))
+                entries.append((entry.stat().st_mtime, size, entry))
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def clear(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
@@ -0,0 +1,285 @@
+"""Batched distance engines that cache per-series precomputations."""
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Tuple
+
+import numpy as np
+from joblib import Parallel, delayed, effective_n_jobs
+from numba import njit
+from scipy.fft import irfft, rfft
+
+from .batching import _as_pair_array, _balanced_chunks, _chunks_per_worker, _pack_series, _pair_costs
+from .kernels import _kdtw_normalized_distance, _kdtw_self_similarity, _normalize_time_series
+from .ragged import SeriesLike
+
+
+# upper bound for the temporary cross-correlation buffers of the batched engines
+_engine_block_bytes = 64 * 1024 * 1024
+# upper bound for the cached spectra of the SBD engine (the spectra of the current FFT
+# size are always kept)
+_sbd_spectra_bytes = 256 * 1024 * 1024
+
+
+@dataclass
+class SBDEngine:
+    """Batched SBD computation with cached per-series spectra and norms.
+
+    The series are bucketed by their FFT size, the next power of two of
+    ``2 * length - 1``, so that variable-length datasets share a few padded sizes. The
+    real FFTs of all series are computed lazily once per bucket that is needed, so a
+    pair only costs a spectrum product and an inverse FFT, which are batched over many
+    pairs. The least recently used buckets are evicted once the cached spectra exceed
+    ``max_spectra_bytes``.
+    """
+    values: np.ndarray
+    offsets: np.ndarray
+    lengths: np.ndarray
+    norms: np.ndarray
+    fft_sizes: np.ndarray
+    workers: int = 1
+    max_spectra_bytes: int = _sbd_spectra_bytes
+    _spectra: OrderedDict = field(default_factory=OrderedDict, repr=False)
+
+    @classmethod
+    def build(cls, series: SeriesLike, workers: int = 1) -> SBDEngine:
+        values, offsets, lengths = _pack_series(series)
+        norms = np.zeros(lengths.shape[0])
+        non_empty = lengths > 0
+        if non_empty.any():
+            # reduceat misreads equal offsets, so only the non-empty series are reduced
+            norms[non_empty] = np.sqrt(np.add.reduceat(values ** 2, offsets[:-1][non_empty]))
+        # next power of two of 2 * length - 1
+        fft_sizes = np.array([1 << max(0, int(2 * length - 2)).bit_length() for length in lengths], dtype=np.int64)
+        return cls(values, offsets, lengths, norms, fft_sizes, workers)
+
+    def _spectra_of_size(self, size: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the row of each series and the spectra of all series fitting into `size`."""
+        if size in self._spectra:
+            self._spectra.move_to_end(size)
+        else:
+            members = np.flatnonzero(self.fft_sizes <= size)
+            member_lengths = self.lengths[members]
+            padded = np.zeros((members.shape[0], size))
+            rows = np.repeat(np.arange(members.shape[0]), member_lengths)
+            starts = np.repeat(np.cumsum(member_lengths) - member_lengths, member_lengths)
+            cols = np.arange(rows.shape[0]) - starts
+            sources = np.repeat(self.offsets[members], member_lengths) + cols
+            padded[rows, cols] = self.values[sources]
+            series_rows = np.full(self.lengths.shape[0], -1, dtype=np.int64)
+            series_rows[members] = np.arange(members.shape[0])
+            self._spectra[size] = (series_rows, rfft(padded, axis=1, workers=self.workers))
+            cached_bytes = sum(spectra.nbytes for _, spectra in self._spectra.values())
+            while cached_bytes > self.max_spectra_bytes and len(self._spectra) > 1:
+                _, (_, evicted) = self._spectra.popitem(last=False)
+                cached_bytes -= evicted.nbytes
+        return self._spectra[size]
+
+    def pairs(self, pairs: np.ndarray) -> np.ndarray:
+        pairs = _as_pair_array(pairs)
+        distances = np.empty(pairs.shape[0], dtype=np.float64)
+        left, right = pairs[:, 0], pairs[:, 1]
+        sizes = np.maximum(self.fft_sizes[left], self.fft_sizes[right])
+        for size in np.unique(sizes):
+            size = int(size)
+            series_rows, spectra = self._spectra_of_size(size)
+            selected = np.flatnonzero(sizes == size)
+            block_size = max(1, _engine_block_bytes // (16 * size))
+            lags = np.arange(size)
+            for start in range(0, selected.shape[0], block_size):
+                block = selected[start:start + block_size]
+                i, j = left[block], right[block]
+                cc = irfft(
+                    spectra[series_rows[i]] * np.conj(spectra[series_rows[j]]),
+                    n=size,
+                    axis=1,
+                    workers=self.workers,
+                )
+                # positive lags are at the front and negative lags at the end of the
+                # circular cross-correlation; the zero-padding in between is ignored
+                valid = (lags[None, :] < self.lengths[i, None]) | (
+                    lags[None, :] > size - self.lengths[j, None]
+                )
+                cc = np.max(np.where(valid, cc, -np.inf), axis=1)
+                distances[block] = np.abs(1 - cc / (self.norms[i] * self.norms[j]))
+        return distances
+
+
+@njit(cache=True, nogil=True)
+def _normalize_chunk(values: np.ndarray, offsets: np.ndarray, out: np.ndarray, start: int, stop: int) -> None:
+    for s in range(start, stop):
+        out[offsets[s]:offsets[s + 1]] = _normalize_time_series(values[offsets[s]:offsets[s + 1]])
+
+
+@njit(cache=True, nogil=True)
+def _kdtw_self_chunk(
+    values: np.ndarray,
+    offsets: np.ndarray,
+    out: np.ndarray,
+    start: int,
+    stop: int,
+    gamma: float,
+    epsilon: float,
+    log_space: bool,
+) -> None:
+    for s in range(start, stop):
+        out[s] = _kdtw_self_similarity(values[offsets[s]:offsets[s + 1]], gamma, epsilon, log_space)
+
+
+@njit(cache=True, nogil=True)
+def _kdtw_pairs_chunk(
+    values: np.ndarray,
+    offsets: np.ndarray,
+    self_similarities: np.ndarray,
+    pairs: np.ndarray,
+    out: np.ndarray,
+    start: int,
+    stop: int,
+    gamma: float,
+    epsilon: float,
+    normalize_dist: bool,
+    log_space: bool,
+) -> None:
+    for k in range(start, stop):
+        i = pairs[k, 0]
+        j = pairs[k, 1]
+        out[k] = _kdtw_normalized_distance(
+            values[offsets[i]:offsets[i + 1]],
+            values[offsets[j]:offsets[j + 1]],
+            self_similarities[i],
+            self_similarities[j],
+            gamma,
+            epsilon,
+            normalize_dist,
+            log_space,
+        )
+
+
+@dataclass
+class KDTWEngine:
+    """Batched KDTW computation with cached normalized series and self-similarities.
+
+    The inputs are normalized and their self-similarities (needed for the distance
+    normalization) are computed once per series, so that each pair only evaluates
+    the cross term.
+    """
+    values: np.ndarray
+    offsets: np.ndarray
+    lengths: np.ndarray
+    self_similarities: np.ndarray
+    gamma: float = 1.0
+    epsilon: float = 1e-20
+    normalize_dist: bool = True
+    log_space: bool = False
+    workers: int = 1
+
+    @classmethod
+    def build(
+        cls,
+        series: SeriesLike,
+        workers: int = 1,
+        gamma: float = 1.0,
+        epsilon: float = 1e-20,
+        normalize_input: bool = True,
+        normalize_dist: bool = True,
+        log_space: bool = False,
+    ) -> KDTWEngine:
+        values, offsets, lengths = _pack_series(series)
+        n = lengths.shape[0]
+        chunks = _balanced_chunks(
+            lengths.astype(np.float64) ** 2, effective_n_jobs(workers) * _chunks_per_worker, min_size=1
+        )
+        if normalize_input:
+            normalized = np.empty_like(values)
+            Parallel(n_jobs=workers, prefer="threads")(
+                delayed(_normalize_chunk)(values, offsets, normalized, s, e) for s, e in chunks
+            )
+            values = normalized
+        self_similarities = np.zeros(n) if log_space else np.ones(n)
+        if normalize_dist:
+            Parallel(n_jobs=workers, prefer="threads")(
+                delayed(_kdtw_self_chunk)(values, offsets, self_similarities, s, e, gamma, epsilon, log_space)
+                for s, e in chunks
+            )
+        return cls(
+            values, offsets, lengths, self_similarities, gamma, epsilon, normalize_dist, log_space, workers
+        )
+
+    def pairs(self, pairs: np.ndarray) -> np.ndarray:
+        pairs = _as_pair_array(pairs)
+        distances = np.empty(pairs.shape[0], dtype=np.float64)
+        if pairs.shape[0] == 0:
+            return distances
+        chunks = _balanced_chunks(
+            _pair_costs(self.lengths, pairs, "kdtw"), effective_n_jobs(self.workers) * _chunks_per_worker
+        )
+        Parallel(n_jobs=self.workers, prefer="threads")(
+            delayed(_kdtw_pairs_chunk)(
+                self.values,
+                self.offsets,
+                self.self_similarities,
+                pairs,
+                distances,
+                s,
+                e,
+                self.gamma,
+                self.epsilon,
+                self.normalize_dist,
+                self.log_space,
+            )
+            for s, e in chunks
+        )
+        return distances
+
+
+class CachedKDTW:
+    """KDTW distance that caches the normalized input and self-similarity per series.
+
+    For callers that pass the series arrays (not their indices) to the metric, such as
+    JET; the cache is keyed by the series' raw bytes. Each joblib worker builds its own
+    cache.
+    """
+
+    def __init__(
+        self,
+        gamma: float = 1.0,
+        epsilon: float = 1e-20,
+        normalize_input: bool = True,
+        normalize_dist: bool = True,
+        log_space: bool = False,
+    ) -> None:
+        self.gamma = gamma
+        self.epsilon = epsilon
+        self.normalize_input = normalize_input
+        self.normalize_dist = normalize_dist
+        self.log_space = log_space
+        self._cache: Dict[bytes, Tuple[np.ndarray, float]] = {}
+
+    def _prepare(self, x: np.ndarray) -> Tuple[np.ndarray, float]:
+        key = x.tobytes()
+        if key not in self._cache:
+            _x = _normalize_time_series(x) if self.normalize_input else x
+            self_x = 0.0
+            if self.normalize_dist:
+                self_x = _kdtw_self_similarity(_x, self.gamma, self.epsilon, self.log_space)
+            self._cache[key] = (_x, self_x)
+        return self._cache[key]
+
+    def __call__(self, x: np.ndarray, y: np.ndarray) -> float:
+        _x, self_x = self._prepare(np.ascontiguousarray(x, dtype=np.float64))
+        _y, self_y = self._prepare(np.ascontiguousarray(y, dtype=np.float64))
+        return _kdtw_normalized_distance(
+            _x, _y, self_x, self_y, self.gamma, self.epsilon, self.normalize_dist, self.log_space
+        )
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # do not ship the cache to the workers
+        return {**self.__dict__, "_cache": {}}
+
+
+# measures with a batched engine, which is preferred over the per-pair kernels
+distance_engines = {
+    "sbd": SBDEngine,
+    "kdtw": KDTWEngine,
+}
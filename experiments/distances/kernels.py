@@ -0,0 +1,417 @@
+"""Numba kernels of the univariate distance measures."""
+from typing import Optional, Tuple
+
+import numpy as np
+from numba import njit
+from scipy.signal import correlate
+
+_eps = np.finfo(np.float64).eps
+
+
+@njit(cache=True, fastmath=True)
+def euclidean_distance(x: np.ndarray, y: np.ndarray) -> float:
+    """Calculate the Euclidean distance between two time series."""
+    # use the minimum of the two series
+    m = min(x.shape[0], y.shape[0])
+    return float(np.linalg.norm(x[:m] - y[:m]))
+
+
+@njit(cache=True, fastmath=True)
+def lorentzian_distance(x: np.ndarray, y: np.ndarray) -> float:
+    """Calculate the Lorentzian distance between two time series."""
+    # use the minimum of the two series
+    m = min(x.shape[0], y.shape[0])
+    return np.sum(np.log(1 + np.abs(x[:m] - y[:m])))
+
+
+@njit(cache=True, fastmath=True)
+def chebyshev_distance(x: np.ndarray, y: np.ndarray) -> float:
+    """Calculate the Chebyshev distance between two time series."""
+    # use the minimum of the two series
+    m = min(x.shape[0], y.shape[0])
+    return float(np.max(np.abs(x[:m] - y[:m])))
+
+
+@njit(cache=True, fastmath=True)
+def _normalize_time_series(x: np.ndarray) -> np.ndarray:
+    return x - np.mean(x) / (np.std(x) + _eps)
+
+
+@njit(cache=True)
+def _logaddexp(a: float, b: float) -> float:
+    if a == -np.inf:
+        return b
+    if b == -np.inf:
+        return a
+    if a > b:
+        return a + np.log1p(np.exp(b - a))
+    return b + np.log1p(np.exp(a - b))
+
+
+@njit(cache=True)
+def _kdtw_local_kernel(a: float, b: float, gamma: float, epsilon: float, log_space: bool) -> float:
+    # 1 / c in the paper; beta on the website
+    factor = 1.0 / 3.0
+    distance = (a - b) ** 2 / gamma
+    if log_space:
+        log_epsilon = np.log(epsilon) if epsilon > 0 else -np.inf
+        return np.log(factor) + _logaddexp(-distance, log_epsilon)
+    return factor * (np.exp(-distance) + epsilon)
+
+
+# no fastmath: the log-space variant represents zero by -inf
+@njit(cache=True)
+def _kdtw_similarity(
+    x: np.ndarray, y: np.ndarray, gamma: float, epsilon: float, log_space: bool = False
+) -> float:
+    """Compute the KDTW kernel value of two series (or its logarithm).
+
+    The local kernel is evaluated on the fly and only two rows of the cost matrix and
+    of the cumulative diagonal matrix are kept, so the memory is linear in the series
+    length. Use ``log_space`` for long series, whose kernel values underflow.
+    """
+    n = x.shape[0]
+    m = y.shape[0]
+    one = 0.0 if log_space else 1.0
+    zero = -np.inf if log_space else 0.0
+
+    # the diagonal weights (local kernel on the diagonal, zero beyond it)
+    diagonal_weights = np.full(max(n, m) + 1, zero)
+    diagonal_weights[0] = one
+    for i in range(1, min(n, m) + 1):
+        diagonal_weights[i] = _kdtw_local_kernel(x[i - 1], y[i - 1], gamma, epsilon, log_space)
+
+    prev_cost = np.empty(m + 1)
+    prev_diag = np.empty(m + 1)
+    curr_cost = np.empty(m + 1)
+    curr_diag = np.empty(m + 1)
+
+    # top row
+    prev_cost[0] = one
+    prev_diag[0] = one
+    for j in range(1, m + 1):
+        local_cost = _kdtw_local_kernel(x[0], y[j - 1], gamma, epsilon, log_space)
+        if log_space:
+            prev_cost[j] = prev_cost[j - 1] + local_cost
+            prev_diag[j] = prev_diag[j - 1] + diagonal_weights[j]
+        else:
+            prev_cost[j] = prev_cost[j - 1] * local_cost
+            prev_diag[j] = prev_diag[j - 1] * diagonal_weights[j]
+
+    for i in range(1, n + 1):
+        # left column
+        local_cost = _kdtw_local_kernel(x[i - 1], y[0], gamma, epsilon, log_space)
+        if log_space:
+            curr_cost[0] = prev_cost[0] + local_cost
+            curr_diag[0] = prev_diag[0] + diagonal_weights[i]
+        else:
+            curr_cost[0] = prev_cost[0] * local_cost
+            curr_diag[0] = prev_diag[0] * diagonal_weights[i]
+
+        for j in range(1, m + 1):
+            local_cost = _kdtw_local_kernel(x[i - 1], y[j - 1], gamma, epsilon, log_space)
+            if log_space:
+                curr_cost[j] = _logaddexp(
+                    _logaddexp(prev_cost[j], curr_cost[j - 1]), prev_cost[j - 1]
+                ) + local_cost
+                curr_diag[j] = _logaddexp(
+                    prev_diag[j] + diagonal_weights[i], curr_diag[j - 1] + diagonal_weights[j]
+                )
+                if i == j:
+                    curr_diag[j] = _logaddexp(curr_diag[j], prev_diag[j - 1] + local_cost)
+            else:
+                curr_cost[j] = (prev_cost[j] + curr_cost[j - 1] + prev_cost[j - 1]) * local_cost
+                curr_diag[j] = prev_diag[j] * diagonal_weights[i] + curr_diag[j - 1] * diagonal_weights[j]
+                if i == j:
+                    curr_diag[j] += prev_diag[j - 1] * local_cost
+        prev_cost, curr_cost = curr_cost, prev_cost
+        prev_diag, curr_diag = curr_diag, prev_diag
+
+    # add the cumulative diagonal to the cost
+    if log_space:
+        return _logaddexp(prev_cost[m], prev_diag[m])
+    return prev_cost[m] + prev_diag[m]
+
+
+@njit(cache=True)
+def _kdtw_self_similarity(x: np.ndarray, gamma: float, epsilon: float, log_space: bool = False) -> float:
+    return _kdtw_similarity(x, x, gamma, epsilon, log_space)
+
+
+@njit(cache=True)
+def _kdtw_normalized_distance(
+    x: np.ndarray,
+    y: np.ndarray,
+    self_x: float,
+    self_y: float,
+    gamma: float,
+    epsilon: float,
+    normalize_dist: bool,
+    log_space: bool = False,
+) -> float:
+    """KDTW distance of two already normalized series with known self-similarities.
+
+    In log space, the self-similarities must be logarithms as well.
+    """
+    current_cost = _kdtw_similarity(x, y, gamma, epsilon, log_space)
+    if log_space:
+        if normalize_dist and np.isfinite(self_x + self_y):
+            current_cost -= 0.5 * (self_x + self_y)
+        return 1.0 - np.exp(current_cost)
+
+    if normalize_dist:
+        norm_factor = np.sqrt(self_x * self_y)
+        if norm_factor != 0.0:
+            current_cost /= norm_factor
+    return 1.0 - current_cost
+
+
+@njit(cache=True)
+def kdtw_distance(
+    x: np.ndarray,
+    y: np.ndarray,
+    gamma: float,
+    epsilon: float,
+    normalize_input: bool,
+    normalize_dist: bool,
+    log_space: bool = False,
+) -> float:
+    """Calculate the KDTW distance between two time series."""
+    if normalize_input:
+        _x = _normalize_time_series(x)
+        _y = _normalize_time_series(y)
+    else:
+        # unify the array types of both branches (dtype and layout)
+        _x = x.astype(np.float64)
+        _y = y.astype(np.float64)
+
+    self_x = _kdtw_self_similarity(_x, gamma, epsilon, log_space) if normalize_dist else 0.0
+    self_y = _kdtw_self_similarity(_y, gamma, epsilon, log_space) if normalize_dist else 0.0
+    return _kdtw_normalized_distance(_x, _y, self_x, self_y, gamma, epsilon, normalize_dist, log_space)
+
+
+@njit(cache=True, fastmath=True)
+def _c(x_i: float, x_i_1: float, y_j: float, constant: float) -> float:
+    if (x_i_1 <= x_i and x_i <= y_j) or (x_i_1 >= x_i and x_i >= y_j):
+        return constant
+    return float(constant + min(np.abs(x_i - x_i_1), np.abs(x_i - y_j)))
+
+
+@njit(cache=True)
+def _round2(value: float) -> float:
+    # round half up to two decimals (like Scala's `round`)
+    return np.floor(value * 100.0 + 0.5) / 100.0
+
+
+@njit(cache=True)
+def _rows_from_column_ranges(
+    lower: np.ndarray,
+    upper: np.ndarray,
+    cols: np.ndarray,
+    row_starts: np.ndarray,
+    row_stops: np.ndarray,
+) -> None:
+    """Convert column-wise row ranges into row-wise column ranges in O(n + m).
+
+    ``cols``, ``row_starts``, and ``row_stops`` must be non-decreasing, so that every
+    row is covered by a contiguous run of entries: the first entry covering a row
+    determines its lower bound and the last one its upper bound.
+    """
+    next_row = 0
+    for k in range(cols.shape[0]):
+        for row in range(max(next_row, row_starts[k]), row_stops[k]):
+            lower[row] = cols[k]
+        next_row = max(next_row, row_stops[k])
+    prev_row = lower.shape[0]
+    for k in range(cols.shape[0] - 1, -1, -1):
+        for row in range(row_starts[k], min(prev_row, row_stops[k])):
+            upper[row] = cols[k] + 1
+        prev_row = min(prev_row, row_starts[k])
+
+
+@njit(cache=True)
+def _bounding_ranges(
+    n: int, m: int, window: Optional[float] = None, itakura_max_slope: Optional[float] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Compute the allowed column range ``[lower[i], upper[i])`` for each row ``i``.
+
+    Mirrors the Sakoe-Chiba band and Itakura parallelogram of DendroTime's
+    ``Bounding.createBoundingMatrix`` without materializing the ``n x m`` mask.
+    """
+    lower = np.full(n, m, dtype=np.int64)
+    upper = np.zeros(n, dtype=np.int64)
+    if itakura_max_slope is not None and window is not None:
+        raise ValueError("itakura_max_slope and window cannot be set at the same time")
+
+    if itakura_max_slope is not None:
+        if not (0.0 < itakura_max_slope < 1.0):
+            raise ValueError("itakura_max_slope must be between 0 and 1")
+        if n != m:
+            raise ValueError("itakura_max_slope can only be used for equal length time series")
+        max_slope = np.floor(itakura_max_slope * (min(n, m) / 100.0) * 100.0)
+        min_slope = 1.0 / max_slope
+        max_slope *= n / m
+        min_slope *= n / m
+        cols = np.arange(m)
+        row_starts = np.empty(m, dtype=np.int64)
+        row_stops = np.empty(m, dtype=np.int64)
+        for col in range(m):
+            low = int(np.ceil(max(
+                _round2(col * min_slope),
+                _round2((n - 1) - max_slope * (m - 1) + max_slope * col),
+            )))
+            high = int(np.floor(min(
+                _round2(col * max_slope),
+                _round2((n - 1) - min_slope * (m - 1) + min_slope * col),
+            ))) + 1
+            row_starts[col] = min(n, max(0, low))
+            row_stops[col] = max(row_starts[col], min(n, high))
+        _rows_from_column_ranges(lower, upper, cols, row_starts, row_stops)
+
+    elif window is not None:
+        if not (0.0 < window < 1.0):
+            raise ValueError("window must be between 0 and 1")
+        # the band is always computed along the shorter series (and then transposed)
+        short, long = min(n, m), max(n, m)
+        max_size = long + 1
+        thickness = int(np.floor(window * short))
+        long_indices = np.empty(max_size, dtype=np.int64)
+        short_starts = np.empty(max_size, dtype=np.int64)
+        short_stops = np.empty(max_size, dtype=np.int64)
+        for k in range(max_size):
+            center = int(np.floor(k / max_size * short))
+            long_indices[k] = int(np.floor(k / max_size * long))
+            short_starts[k] = max(0, center - thickness)
+            short_stops[k] = min(short, center + thickness + 1)
+        if n <= m:
+            _rows_from_column_ranges(lower, upper, long_indices, short_starts, short_stops)
+        else:
+            for k in range(max_size):
+                row = long_indices[k]
+                lower[row] = min(lower[row], short_starts[k])
+                upper[row] = max(upper[row], short_stops[k])
+
+    else:
+        lower[:] = 0
+        upper[:] = m
+    return lower, upper
+
+
+# no fastmath: out-of-band cells are represented by inf
+@njit(cache=True)
+def msm_distance(
+    x: np.ndarray,
+    y: np.ndarray,
+    constant: Optional[float] = 0.5,
+    window: Optional[float] = None,
+    itakura_max_slope: Optional[float] = None,
+) -> float:
+    """Calculate the MSM distance between two time series.
+
+    Only the cells inside the Sakoe-Chiba band (``window``) or the Itakura
+    parallelogram (``itakura_max_slope``) are evaluated, and only two rows of the
+    cost matrix are kept, each as wide as the band.
+    """
+    constant = constant or 0.5
+    m = x.shape[0]
+    n = y.shape[0]
+    if m == 0 or n == 0:
+        return 0.0
+
+    lower, upper = _bounding_ranges(m, n, window, itakura_max_slope)
+    width = max(1, int(np.max(upper - lower)))
+    prev = np.full(width, np.inf)
+    curr = np.full(width, np.inf)
+    prev_lower = 0
+    prev_upper = 0
+
+    for i in range(m):
+        curr_lower = lower[i]
+        curr_upper = upper[i]
+        for j in range(curr_lower, curr_upper):
+            if i == 0 and j == 0:
+                cost = np.abs(x[0] - y[0])
+            else:
+                cost = np.inf
+                if i > 0 and prev_lower <= j - 1 and j - 1 < prev_upper:
+                    cost = prev[j - 1 - prev_lower] + np.abs(x[i] - y[j])
+                if i > 0 and prev_lower <= j and j < prev_upper:
+                    cost = min(cost, prev[j - prev_lower] + _c(x[i], x[i - 1], y[j], constant))
+                if j > curr_lower:
+                    cost = min(cost, curr[j - 1 - curr_lower] + _c(y[j], x[i], y[j - 1], constant))
+            curr[j - curr_lower] = cost
+        prev, curr = curr, prev
+        prev_lower = curr_lower
+        prev_upper = curr_upper
+
+    if prev_lower <= n - 1 and n - 1 < prev_upper:
+        return float(prev[n - 1 - prev_lower])
+    return np.inf
+
+
+# no fastmath: out-of-band cells are represented by inf
+@njit(cache=True)
+def dtw_distance(
+    x: np.ndarray,
+    y: np.ndarray,
+    window: Optional[float] = None,
+    itakura_max_slope: Optional[float] = None,
+    cutoff: float = np.inf,
+) -> float:
+    """Calculate the DTW distance (sum of squared differences) between two time series.
+
+    Like ``msm_distance``, only the cells inside the band are evaluated using two
+    band-wide rows. As soon as all cells of a row exceed ``cutoff``, the final
+    distance cannot be smaller anymore and ``inf`` is returned.
+    """
+    m = x.shape[0]
+    n = y.shape[0]
+    if m == 0 or n == 0:
+        return 0.0
+
+    lower, upper = _bounding_ranges(m, n, window, itakura_max_slope)
+    width = max(1, int(np.max(upper - lower)))
+    prev = np.full(width, np.inf)
+    curr = np.full(width, np.inf)
+    prev_lower = 0
+    prev_upper = 0
+
+    for i in range(m):
+        curr_lower = lower[i]
+        curr_upper = upper[i]
+        row_min = np.inf
+        for j in range(curr_lower, curr_upper):
+            if i == 0 and j == 0:
+                best = 0.0
+            else:
+                best = np.inf
+                if i > 0 and prev_lower <= j - 1 and j - 1 < prev_upper:
+                    best = prev[j - 1 - prev_lower]
+                if i > 0 and prev_lower <= j and j < prev_upper:
+                    best = min(best, prev[j - prev_lower])
+                if j > curr_lower:
+                    best = min(best, curr[j - 1 - curr_lower])
+            diff = x[i] - y[j]
+            cost = best + diff * diff
+            curr[j - curr_lower] = cost
+            row_min = min(row_min, cost)
+        if row_min > cutoff:
+            return np.inf
+        prev, curr = curr, prev
+        prev_lower = curr_lower
+        prev_upper = curr_upper
+
+    if prev_lower <= n - 1 and n - 1 < prev_upper:
+        return float(prev[n - 1 - prev_lower])
+    return np.inf
+
+
+def sbd_distance(x: np.ndarray, y: np.ndarray) -> float:
+    return abs(
+        float(
+            1
+            - np.max(
+                correlate(x, y, method="fft") / np.sqrt(np.dot(x, x) * np.dot(y, y))
+            )
+        )
+    )
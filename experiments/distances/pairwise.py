@@ -0,0 +1,358 @@
+"""Batched computation of distances between pairs of time series."""
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Tuple, Union
+
+import numpy as np
+from joblib import Parallel, delayed, effective_n_jobs
+from numba import njit
+
+from .batching import (
+    _as_pair_array,
+    _balanced_chunks,
+    _chunks_per_worker,
+    _column_tile_size,
+    _lockstep_distances,
+    _pack_series,
+    _pair_costs,
+)
+from .bounds import EnvelopeIndex
+from .cache import dataset_fingerprint
+from .engines import distance_engines
+from .ragged import RaggedSeries, SeriesLike
+from .registry import distance_defaults, get_distance_function, measure_ids, measure_params, pair_distance
+
+
+@njit(cache=True, nogil=True)
+def _distance_pairs_chunk(
+    measure: int,
+    params: np.ndarray,
+    values: np.ndarray,
+    offsets: np.ndarray,
+    pairs: np.ndarray,
+    out: np.ndarray,
+    start: int,
+    stop: int,
+) -> None:
+    for k in range(start, stop):
+        i = pairs[k, 0]
+        j = pairs[k, 1]
+        out[k] = pair_distance(measure, params, values[offsets[i]:offsets[i + 1]], values[offsets[j]:offsets[j + 1]])
+
+
+@contextmanager
+def _published(**arrays: np.ndarray) -> Iterator[Dict[str, str]]:
+    """Save the arrays once as ``.npy`` files, so that process workers only get their paths."""
+    with tempfile.TemporaryDirectory(prefix="distances-") as folder:
+        paths = {}
+        for name, array in arrays.items():
+            paths[name] = os.path.join(folder, f"{name}.npy")
+            np.save(paths[name], np.ascontiguousarray(array))
+        yield paths
+
+
+def _run_attached(worker: Callable[..., np.ndarray], paths: Dict[str, str], *args: Any) -> np.ndarray:
+    # memory-map the published arrays; all worker processes share their pages
+    arrays = {name: np.asarray(np.load(path, mmap_mode="r")) for name, path in paths.items()}
+    return worker(*args, **arrays)
+
+
+def _distance_pairs_chunk_py(
+    func: Callable[[np.ndarray, np.ndarray], float],
+    start: int,
+    stop: int,
+    values: np.ndarray,
+    offsets: np.ndarray,
+    pairs: np.ndarray,
+) -> np.ndarray:
+    return np.array(
+        [func(values[offsets[i]:offsets[i + 1]], values[offsets[j]:offsets[j + 1]]) for i, j in pairs[start:stop]],
+        dtype=np.float64,
+    )
+
+
+def _compute_pairs(
+    series: SeriesLike,
+    pairs: np.ndarray,
+    distance_name: str,
+    distance_params: Dict[str, Any],
+    n_jobs: int,
+) -> np.ndarray:
+    distances = np.empty(pairs.shape[0], dtype=np.float64)
+    if pairs.shape[0] == 0:
+        return distances
+
+    n_workers = effective_n_jobs(n_jobs)
+    if distance_name in measure_ids:
+        measure = measure_ids[distance_name]
+        params = measure_params(distance_name, **distance_params)
+        values, offsets, lengths = _pack_series(series)
+        chunks = _balanced_chunks(
+            _pair_costs(lengths, pairs, distance_name), n_workers * _chunks_per_worker
+        )
+        if n_workers == 1 or len(chunks) == 1:
+            _distance_pairs_chunk(measure, params, values, offsets, pairs, distances, 0, pairs.shape[0])
+        else:
+            Parallel(n_jobs=n_jobs, prefer="threads")(
+                delayed(_distance_pairs_chunk)(measure, params, values, offsets, pairs, distances, s, e)
+                for s, e in chunks
+            )
+    else:
+        func = get_distance_function(distance_name, **distance_params)
+        values, offsets, lengths = _pack_series(series)
+        if n_workers == 1:
+            distances[:] = _distance_pairs_chunk_py(func, 0, pairs.shape[0], values, offsets, pairs)
+            return distances
+        chunks = _balanced_chunks(
+            _pair_costs(lengths, pairs, distance_name), n_workers * _chunks_per_worker
+        )
+        # publish the dataset and the pairs once; the tasks only carry index ranges
+        with _published(values=values, offsets=offsets, pairs=pairs) as paths:
+            results = Parallel(n_jobs=n_jobs)(
+                delayed(_run_attached)(_distance_pairs_chunk_py, paths, func, s, e) for s, e in chunks
+            )
+        for (s, e), result in zip(chunks, results):
+            distances[s:e] = result
+    return distances
+
+
+def distance_pairs(
+    series: SeriesLike,
+    pairs: Union[List[Tuple[int, int]], np.ndarray],
+    distance_name: str = "euclidean",
+    **kwargs: Any
+) -> Union[np.ndarray, Tuple[np.ndarray, int]]:
+    """Compute the distances of the given index pairs in cost-balanced batches.
+
+    The pairs are converted to an ``int32 (k, 2)`` array and split into contiguous
+    chunks of similar estimated cost. Compiled (numba) measures evaluate each chunk in
+    a single GIL-free loop on a thread and write directly into the preallocated
+    result array; other measures run in worker processes, which memory-map the dataset
+    saved once to the temporary folder and only receive the index ranges of their chunks.
+
+    If a ``threshold`` is given (DTW and MSM only), the distance is only computed for
+    pairs whose lower bound (see `EnvelopeIndex`) is below it; all other pairs get a
+    distance of ``inf``. Pass a prebuilt ``lower_bound_index`` to reuse the envelopes
+    and ``return_n_pruned=True`` to also get the number of pruned pairs.
+
+    Measures with a batched engine (see `distance_engines`) use it instead of the
+    per-pair kernel; pass a prebuilt ``engine`` to reuse its caches across calls.
+
+    With a `DistanceCache` as ``cache``, only the pairs missing from the cache are
+    computed and then added to it (pruned pairs are not cached). Pass the dataset's
+    ``fingerprint`` to avoid rehashing the series on every call. The cache stores
+    ``float32`` values, so all returned distances are rounded to ``float32`` then.
+    """
+    n_jobs = kwargs.get("n_jobs", 1)
+    threshold = kwargs.get("threshold", None)
+    distance_params = kwargs.get("distance_params", {})
+    pairs = _as_pair_array(pairs)
+
+    cache = kwargs.get("cache", None)
+    if cache is not None:
+        fingerprint = kwargs.get("fingerprint", None) or dataset_fingerprint(series)
+        params = {**distance_defaults.get(distance_name, {}), **distance_params}
+        key = cache.key(fingerprint, distance_name, params)
+        distances = cache.get_pairs(key, pairs, len(series))
+        missing = np.isnan(distances)
+        computed, n_pruned = distance_pairs(
+            series, pairs[missing], distance_name, **{**kwargs, "cache": None, "return_n_pruned": True}
+        )
+        computed = computed.astype(np.float32)
+        distances[missing] = computed
+        finite = np.isfinite(computed)
+        cache.put_pairs(key, pairs[missing][finite], computed[finite], len(series))
+        if kwargs.get("return_n_pruned", False):
+            return distances, n_pruned
+        return distances
+
+    engine = kwargs.get("engine", None)
+    if engine is None and distance_name in distance_engines:
+        engine = distance_engines[distance_name].build(series, workers=n_jobs, **distance_params)
+
+    def compute(selected_pairs: np.ndarray) -> np.ndarray:
+        if engine is not None:
+            return engine.pairs(selected_pairs)
+        return _compute_pairs(series, selected_pairs, distance_name, distance_params, n_jobs)
+
+    n_pruned = 0
+    if threshold is None:
+        distances = compute(pairs)
+    else:
+        index = kwargs.get("lower_bound_index", None)
+        if index is None:
+            params = {**distance_defaults.get(distance_name, {}), **distance_params}
+            index = EnvelopeIndex.build(series, params.get("window", None))
+        candidates = index.lower_bounds(pairs, distance_name, **distance_params) < threshold
+        n_pruned = int(pairs.shape[0] - np.count_nonzero(candidates))
+        distances = np.full(pairs.shape[0], np.inf, dtype=np.float64)
+        distances[candidates] = compute(pairs[candidates])
+
+    if kwargs.get("return_n_pruned", False):
+        return distances, n_pruned
+    return distances
+
+
+@njit(cache=True, nogil=True)
+def _matrix_other_block(
+    measure: int,
+    params: np.ndarray,
+    values: np.ndarray,
+    offsets: np.ndarray,
+    other_values: np.ndarray,
+    other_offsets: np.ndarray,
+    out: np.ndarray,
+    start: int,
+    stop: int,
+) -> None:
+    n_other = other_offsets.shape[0] - 1
+    # process the columns in tiles, so that the other series of a tile stay in cache
+    # while we iterate over the rows of the block
+    for tile_start in range(0, n_other, _column_tile_size):
+        tile_stop = min(tile_start + _column_tile_size, n_other)
+        for i in range(start, stop):
+            x = values[offsets[i]:offsets[i + 1]]
+            for j in range(tile_start, tile_stop):
+                out[i, j] = pair_distance(measure, params, x, other_values[other_offsets[j]:other_offsets[j + 1]])
+
+
+def _matrix_other_block_py(
+    func: Callable[[np.ndarray, np.ndarray], float],
+    start: int,
+    stop: int,
+    values: np.ndarray,
+    offsets: np.ndarray,
+    other_values: np.ndarray,
+    other_offsets: np.ndarray,
+) -> np.ndarray:
+    others = [other_values[other_offsets[j]:other_offsets[j + 1]] for j in range(other_offsets.shape[0] - 1)]
+    return np.array(
+        [[func(values[offsets[i]:offsets[i + 1]], y) for y in others] for i in range(start, stop)],
+        dtype=np.float64,
+    )
+
+
+def matrix_other(
+    series: SeriesLike,
+    other: SeriesLike,
+    distance_name: str = "euclidean",
+    **kwargs: Any,
+) -> np.ndarray:
+    """Compute the ``(len(series), len(other))`` cross-distance matrix in row blocks.
+
+    Each row block is a single task that writes directly into the result matrix;
+    measures with a batched engine compute a row block with a single batched FFT.
+    Use ``dtype=np.float32`` to halve the memory of the result.
+    """
+    n_jobs = kwargs.get("n_jobs", 1)
+    dtype = kwargs.get("dtype", np.float64)
+    distance_params = kwargs.get("distance_params", {})
+    n, p = len(series), len(other)
+    distance_matrix = np.empty((n, p), dtype=dtype)
+    if n == 0 or p == 0:
+        return distance_matrix
+
+    n_workers = effective_n_jobs(n_jobs)
+    if distance_name in distance_engines:
+        # the engine batches the row-major pairs, so each batch covers a block of rows
+        combined = RaggedSeries.from_series(series).concatenate(RaggedSeries.from_series(other))
+        engine = distance_engines[distance_name].build(
+            combined, workers=n_jobs, **distance_params
+        )
+        rows, cols = np.meshgrid(np.arange(n), np.arange(n, n + p), indexing="ij")
+        pairs = np.stack((rows.ravel(), cols.ravel()), axis=1)
+        distance_matrix[:] = engine.pairs(pairs).reshape(n, p)
+    elif distance_name in measure_ids:
+        measure = measure_ids[distance_name]
+        params = measure_params(distance_name, **distance_params)
+        values, offsets, lengths = _pack_series(series)
+        other_values, other_offsets, _ = _pack_series(other)
+        # all rows are compared to the same series, so the row length determines the cost
+        blocks = _balanced_chunks(
+            lengths.astype(np.float64), n_workers * _chunks_per_worker, min_size=1
+        )
+        Parallel(n_jobs=n_jobs, prefer="threads")(
+            delayed(_matrix_other_block)(
+                measure, params, values, offsets, other_values, other_offsets, distance_matrix, s, e
+            )
+            for s, e in blocks
+        )
+    else:
+        func = get_distance_function(distance_name, **distance_params)
+        arrays = dict(zip(("values", "offsets"), _pack_series(series)[:2]))
+        arrays.update(zip(("other_values", "other_offsets"), _pack_series(other)[:2]))
+        if n_workers == 1:
+            distance_matrix[:] = _matrix_other_block_py(func, 0, n, **arrays)
+            return distance_matrix
+        blocks = _balanced_chunks(np.ones(n), n_workers * _chunks_per_worker, min_size=1)
+        # publish both datasets once; the tasks only carry row ranges
+        with _published(**arrays) as paths:
+            results = Parallel(n_jobs=n_jobs)(
+                delayed(_run_attached)(_matrix_other_block_py, paths, func, s, e) for s, e in blocks
+            )
+        for (s, e), result in zip(blocks, results):
+            distance_matrix[s:e] = result
+    return distance_matrix
+
+
+@njit(cache=True, nogil=True)
+def _condensed_rows(
+    measure: int,
+    params: np.ndarray,
+    values: np.ndarray,
+    offsets: np.ndarray,
+    out: np.ndarray,
+    start: int,
+    stop: int,
+) -> None:
+    n = offsets.shape[0] - 1
+    for i in range(start, stop):
+        x = values[offsets[i]:offsets[i + 1]]
+        # index of (i, i + 1) in the condensed vector
+        k = n * i - i * (i + 1) // 2
+        for j in range(i + 1, n):
+            out[k] = pair_distance(measure, params, x, values[offsets[j]:offsets[j + 1]])
+            k += 1
+
+
+def pdist(series: SeriesLike, distance_name: str = "euclidean", **kwargs: Any) -> np.ndarray:
+    """Compute the condensed distance matrix (see `scipy.spatial.distance.pdist`).
+
+    Compiled measures fill the condensed vector row by row without materializing the
+    pairs; the rows are split into blocks of similar cost. All other measures are
+    computed with `distance_pairs`. Use ``dtype=np.float32`` to halve the memory of
+    the result.
+    """
+    n_jobs = kwargs.get("n_jobs", 1)
+    dtype = kwargs.get("dtype", np.float64)
+    distance_params = kwargs.get("distance_params", {})
+    n = len(series)
+    if distance_name in distance_engines or distance_name not in measure_ids:
+        i, j = np.triu_indices(n, k=1)
+        pairs = np.stack((i, j), axis=1)
+        return distance_pairs(series, pairs, distance_name, **kwargs).astype(dtype)
+
+    distances = np.empty(n * (n - 1) // 2, dtype=dtype)
+    if distances.shape[0] == 0:
+        return distances
+    values, offsets, lengths = _pack_series(series)
+    lengths = lengths.astype(np.float64)
+    if distance_name in _lockstep_distances:
+        row_costs = lengths * np.arange(n - 1, -1, -1)
+    else:
+        row_costs = lengths * (np.cumsum(lengths[::-1])[::-1] - lengths)
+    blocks = _balanced_chunks(row_costs, effective_n_jobs(n_jobs) * _chunks_per_worker, min_size=1)
+    Parallel(n_jobs=n_jobs, prefer="threads")(
+        delayed(_condensed_rows)(
+            measure_ids[distance_name],
+            measure_params(distance_name, **distance_params),
+            values,
+            offsets,
+            distances,
+            s,
+            e,
+        )
+        for s, e in blocks
+    )
+    return distances
@@ -0,0 +1,99 @@
+"""Compact container for datasets of (univariate) variable-length time series."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Iterator, List, Sequence, Union
+
+import numpy as np
+from numba import njit
+
+
+# anything the distance functions accept as a dataset
+SeriesLike = Union["RaggedSeries", np.ndarray, Sequence[np.ndarray]]
+
+
+@njit(cache=True, nogil=True)
+def series_view(values: np.ndarray, offsets: np.ndarray, i: int) -> np.ndarray:
+    """Zero-copy view of the i-th series of a packed buffer (usable in numba code)."""
+    return values[offsets[i]:offsets[i + 1]]
+
+
+@njit(cache=True, nogil=True)
+def series_length(offsets: np.ndarray, i: int) -> int:
+    return offsets[i + 1] - offsets[i]
+
+
+@dataclass
+class RaggedSeries:
+    """Variable-length time series in one contiguous buffer with int64 offsets.
+
+    The i-th series is ``values[offsets[i]:offsets[i + 1]]``; indexing returns a
+    zero-copy view. Compared to a list of small arrays, this avoids the per-array
+    overhead, pickles as three arrays, and can be passed directly to numba code.
+    """
+    values: np.ndarray
+    offsets: np.ndarray
+    lengths: np.ndarray
+
+    @classmethod
+    def from_series(
+        cls, series: SeriesLike, dtype: np.dtype = np.float64
+    ) -> RaggedSeries:
+        if isinstance(series, RaggedSeries):
+            return series.astype(dtype)
+        if isinstance(series, np.ndarray) and series.ndim == 2:
+            n, length = series.shape
+            values = np.ascontiguousarray(series, dtype=dtype).reshape(-1)
+            lengths = np.full(n, length, dtype=np.int64)
+        else:
+            lengths = np.array([len(ts) for ts in series], dtype=np.int64)
+            values = np.empty(int(lengths.sum()), dtype=dtype)
+            offset = 0
+            for ts, length in zip(series, lengths):
+                values[offset:offset + length] = np.asarray(ts).reshape(-1)
+                offset += length
+        offsets = np.zeros(lengths.shape[0] + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return cls(values, offsets, lengths)
+
+    def astype(self, dtype: np.dtype) -> RaggedSeries:
+        if self.values.dtype == dtype and self.values.flags.c_contiguous:
+            return self
+        return RaggedSeries(np.ascontiguousarray(self.values, dtype=dtype), self.offsets, self.lengths)
+
+    def take(self, indices: Union[Sequence[int], np.ndarray]) -> RaggedSeries:
+        """Copy the selected series into a new container."""
+        indices = np.asarray(indices, dtype=np.int64)
+        lengths = self.lengths[indices]
+        offsets = np.zeros(indices.shape[0] + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        values = np.empty(int(offsets[-1]), dtype=self.values.dtype)
+        for k, i in enumerate(indices):
+            values[offsets[k]:offsets[k + 1]] = self.values[self.offsets[i]:self.offsets[i + 1]]
+        return RaggedSeries(values, offsets, lengths)
+
+    def concatenate(self, other: RaggedSeries) -> RaggedSeries:
+        values = np.concatenate((self.values, other.values.astype(self.values.dtype, copy=False)))
+        offsets = np.concatenate((self.offsets, other.offsets[1:] + self.offsets[-1]))
+        return RaggedSeries(values, offsets, np.concatenate((self.lengths, other.lengths)))
+
+    def to_list(self) -> List[np.ndarray]:
+        return list(self)
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + self.offsets.nbytes + self.lengths.nbytes
+
+    def __len__(self) -> int:
+        return self.lengths.shape[0]
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f"series index {i} out of range for {len(self)} series")
+        return self.values[self.offsets[i]:self.offsets[i + 1]]
+
+    def __iter__(self) -> Iterator[np.ndarray]:
+        for i in range(len(self)):
+            yield self.values[self.offsets[i]:self.offsets[i + 1]]
@@ -0,0 +1,109 @@
+"""Registry of the distance functions by name and their (default) parameters.
+
+The compiled measures are addressed by an integer id and their parameters are packed
+into a ``float64`` array (``nan`` for ``None``), so that `pair_distance` and the
+chunk loops calling it are plain top-level functions whose compiled code numba caches
+on disk. Closures over the parameters could not be cached.
+"""
+from functools import partial
+from typing import Any, Callable, Dict
+
+import numpy as np
+from numba import njit
+
+from .kernels import (
+    chebyshev_distance,
+    dtw_distance,
+    euclidean_distance,
+    kdtw_distance,
+    lorentzian_distance,
+    msm_distance,
+    sbd_distance,
+)
+
+# ids of the compiled measures in `pair_distance`
+measure_ids = {
+    "euclidean": 0,
+    "lorentzian": 1,
+    "chebyshev": 2,
+    "msm": 3,
+    "dtw": 4,
+    "kdtw": 5,
+}
+# the defaults match experiments/common.conf; the order is the order of the kernel arguments
+distance_defaults = {
+    "msm": {"constant": 0.5, "window": 0.05, "itakura_max_slope": None},
+    "dtw": {"window": 0.05, "itakura_max_slope": None, "cutoff": np.inf},
+    "kdtw": {
+        "gamma": 1.0,
+        "epsilon": 1e-20,
+        "normalize_input": True,
+        "normalize_dist": True,
+        "log_space": False,
+    },
+}
+
+
+def measure_params(distance_name: str, **params: Any) -> np.ndarray:
+    """Pack the parameters of a measure (merged with its defaults) for `pair_distance`."""
+    defaults: Dict[str, Any] = distance_defaults.get(distance_name, {})
+    unknown = set(params) - set(defaults)
+    if unknown:
+        raise ValueError(f"The {distance_name} distance does not accept the parameters {unknown}")
+    values = {**defaults, **params}
+    return np.array([np.nan if values[k] is None else float(values[k]) for k in defaults], dtype=np.float64)
+
+
+@njit(cache=True)
+def _banded_msm(x: np.ndarray, y: np.ndarray, constant: float, window: float, slope: float) -> float:
+    if not np.isnan(slope):
+        return msm_distance(x, y, constant, None, slope)
+    if not np.isnan(window):
+        return msm_distance(x, y, constant, window, None)
+    return msm_distance(x, y, constant, None, None)
+
+
+@njit(cache=True)
+def _banded_dtw(x: np.ndarray, y: np.ndarray, window: float, slope: float, cutoff: float) -> float:
+    if not np.isnan(slope):
+        return dtw_distance(x, y, None, slope, cutoff)
+    if not np.isnan(window):
+        return dtw_distance(x, y, window, None, cutoff)
+    return dtw_distance(x, y, None, None, cutoff)
+
+
+@njit(cache=True, nogil=True)
+def pair_distance(measure: int, params: np.ndarray, x: np.ndarray, y: np.ndarray) -> float:
+    """Distance of the compiled measure ``measure`` (see `measure_ids`) with packed ``params``."""
+    if measure == 0:
+        return euclidean_distance(x, y)
+    elif measure == 1:
+        return lorentzian_distance(x, y)
+    elif measure == 2:
+        return chebyshev_distance(x, y)
+    elif measure == 3:
+        return _banded_msm(x, y, params[0], params[1], params[2])
+    elif measure == 4:
+        return _banded_dtw(x, y, params[0], params[1], params[2])
+    else:
+        return kdtw_distance(x, y, params[0], params[1], params[2] != 0.0, params[3] != 0.0, params[4] != 0.0)
+
+
+def get_distance_function(distance_name: str, **params: Any) -> Callable[[np.ndarray, np.ndarray], float]:
+    """Look up a distance function; compiled measures are bound to their packed parameters."""
+    if distance_name not in measure_ids:
+        if params:
+            raise ValueError(f"The {distance_name} distance does not accept parameters, got {params}")
+        return distance_functions[distance_name]
+    return partial(pair_distance, measure_ids[distance_name], measure_params(distance_name, **params))
+
+
+distance_functions = {
+    "euclidean": euclidean_distance,
+    "lorentzian": lorentzian_distance,
+    "sbd": sbd_distance,
+    "msm": get_distance_function("msm"),
+    "dtw": get_distance_function("dtw"),
+    "kdtw": get_distance_function("kdtw"),
+    "chebyshev": chebyshev_distance,
+}
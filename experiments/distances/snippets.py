@@ -0,0 +1,93 @@
+"""Batched snippet-based approximations of the pairwise distances."""
+from typing import Any, Callable, Dict, Tuple
+
+import numpy as np
+
+from .pairwise import pdist
+from .ragged import RaggedSeries, SeriesLike
+
+
+def _begin(lengths: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    return np.zeros_like(lengths), np.full_like(lengths, size)
+
+
+def _end(lengths: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    return lengths - size, lengths
+
+
+def _center(lengths: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    center = lengths // 2
+    return center - size // 2, center + size // 2
+
+
+def _offset_begin(rel_offset: float) -> Callable[[np.ndarray, int], Tuple[np.ndarray, np.ndarray]]:
+    def _bounds(lengths: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray]:
+        offsets = (lengths * rel_offset).astype(np.int64)
+        return offsets, offsets + size
+
+    return _bounds
+
+
+def _offset_end(rel_offset: float) -> Callable[[np.ndarray, int], Tuple[np.ndarray, np.ndarray]]:
+    def _bounds(lengths: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray]:
+        offsets = (lengths * rel_offset).astype(np.int64)
+        return lengths - offsets - size, lengths - offsets
+
+    return _bounds
+
+
+# the approximation strategies of DendroTime (see scripts/analyze-approximations.py)
+snippet_strategies: Dict[str, Callable[[np.ndarray, int], Tuple[np.ndarray, np.ndarray]]] = {
+    "begin": _begin,
+    "end": _end,
+    "center": _center,
+    "offsetBegin10": _offset_begin(0.1),
+    "offsetBegin20": _offset_begin(0.2),
+    "offsetEnd10": _offset_end(0.1),
+    "offsetEnd20": _offset_end(0.2),
+}
+
+
+def extract_snippets(series: SeriesLike, strategy: str = "center", snippet_size: int = 20) -> RaggedSeries:
+    """Cut one snippet out of every series.
+
+    The snippet bounds are clipped to the series (like Scala's ``slice``), so series
+    shorter than ``snippet_size`` yield shorter snippets. If all snippets have the same
+    length, ``values.reshape(n, snippet_size)`` is the stacked snippet matrix.
+    """
+    ragged = RaggedSeries.from_series(series)
+    starts, stops = snippet_strategies[strategy](ragged.lengths, snippet_size)
+    starts = np.clip(starts, 0, ragged.lengths)
+    stops = np.clip(stops, starts, ragged.lengths)
+    lengths = stops - starts
+    offsets = np.zeros(lengths.shape[0] + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    # gather all snippet values with a single index array
+    positions = np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths)
+    values = ragged.values[np.repeat(ragged.offsets[:-1] + starts, lengths) + positions]
+    return RaggedSeries(values, offsets, lengths)
+
+
+def approximate_pdist(
+    series: SeriesLike,
+    distance_name: str = "msm",
+    strategy: str = "center",
+    snippet_size: int = 20,
+    **kwargs: Any,
+) -> np.ndarray:
+    """Approximate the condensed distance matrix from snippets of the series.
+
+    The distances of the snippets are computed with one batched `pdist` and scaled by
+    ``max(len(x), len(y)) / snippet_size`` to account for the full series lengths. The
+    keyword arguments are passed to `pdist`.
+    """
+    ragged = RaggedSeries.from_series(series)
+    snippets = extract_snippets(ragged, strategy, snippet_size)
+    distances = pdist(snippets, distance_name, **kwargs)
+    lengths = ragged.lengths
+    n = lengths.shape[0]
+    for i in range(n - 1):
+        # the pairs (i, j > i) form a contiguous row of the condensed vector
+        k = n * i - i * (i + 1) // 2
+        distances[k:k + n - 1 - i] *= np.maximum(lengths[i], lengths[i + 1:]) / snippet_size
+    return distances
@@ -0,0 +1,43 @@
+"""Ahead-of-time compilation of the distance kernels before any timed region."""
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+
+from .engines import CachedKDTW
+from .pairwise import distance_pairs, matrix_other
+from .registry import distance_functions
+
+
+def warmup(
+    distance_names: Optional[Iterable[str]] = None,
+    dtypes: Sequence[np.dtype] = (np.float64, np.float32),
+    length: int = 16,
+) -> None:
+    """Compile the kernels, chunk loops, and engines of the given distances.
+
+    Numba compiles a kernel on its first call for each argument signature, which
+    otherwise ends up in the first timed distance computation. We call every kernel
+    on C-contiguous and strided dummy series of all ``dtypes`` and run the batched
+    paths (`distance_pairs`, `matrix_other`, the lower bounds, and the engines) on a
+    tiny dataset. With ``cache=True``, the compiled code is reused across processes.
+    """
+    if distance_names is None:
+        distance_names = list(distance_functions.keys())
+    rng = np.random.default_rng(0)
+    series = [rng.standard_normal(length), rng.standard_normal(length + 3), rng.standard_normal(length - 2)]
+    pairs = np.array([[0, 1], [1, 2], [0, 2]], dtype=np.int32)
+
+    for distance_name in distance_names:
+        func = distance_functions[distance_name]
+        for dtype in dtypes:
+            x = rng.standard_normal(2 * length).astype(dtype)
+            y = rng.standard_normal(2 * length).astype(dtype)
+            func(x[:length], y[:length])
+            func(x[::2], y[::2])
+
+        distance_pairs(series, pairs, distance_name)
+        matrix_other(series[:2], series[1:], distance_name)
+        if distance_name in ("dtw", "msm"):
+            distance_pairs(series, pairs, distance_name, threshold=np.inf)
+        if distance_name == "kdtw":
+            CachedKDTW()(series[0], series[1])
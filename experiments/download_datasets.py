@@ -1,6 +1,11 @@
 #!/usr/bin/env python3
 import argparse
+import hashlib
+import json
+import os
+import shutil
 import sys
+import tempfile
 
 import numpy as np
 
@@ -13,8 +18,15 @@ from aeon.datasets.tsc_datasets import (
 )
 from aeon.datasets import load_classification
 
+sys.path.append(str(Path(__file__).resolve().parent))
+from distances import RaggedSeries
+from ts_format import read_ts_file
+
 
 DATA_FOLDER = Path(__file__).resolve().parent.parent / "data" / "datasets"
+DATASET_CACHE_FOLDER = Path(
+    os.environ.get("DATASET_CACHE_FOLDER", DATA_FOLDER.parent / "dataset-cache")
+)
 LONG_RUNNING_DATASETS = [
     "Crop",
     "ElectricDevices",
@@ -172,6 +184,105 @@ def select_edeniss_datasets(data_folder):
         return []
 
 
+def _source_files(dataset, data_folder):
+    if dataset.startswith("edeniss"):
+        return [data_folder / "edeniss20182020_anomalies" / f"{dataset}.ts"]
+    return sorted((data_folder / dataset).glob(f"{dataset}*.ts"))
+
+
+def _file_hash(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1024 * 1024), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _is_cache_valid(entry, sources):
+    """Check the cached source files by size and mtime; on changed mtimes, compare the hashes."""
+    meta_file = entry / "sources.json"
+    if not meta_file.exists():
+        return False
+    meta = json.loads(meta_file.read_text())
+    if [m["name"] for m in meta] != [f.name for f in sources]:
+        return False
+    changed = False
+    for m, f in zip(meta, sources):
+        stat = f.stat()
+        if m["size"] != stat.st_size:
+            return False
+        if m["mtime_ns"] != stat.st_mtime_ns:
+            # e.g., a fresh download of the same file
+            if m["hash"] != _file_hash(f):
+                return False
+            m["mtime_ns"] = stat.st_mtime_ns
+            changed = True
+    if changed:
+        meta_file.write_text(json.dumps(meta))
+    return True
+
+
+def _write_cache(entry, sources, X, y):
+    if not isinstance(X, RaggedSeries):
+        X = RaggedSeries.from_series([x.ravel() for x in X])
+    meta = [
+        {"name": f.name, "size": f.stat().st_size, "mtime_ns": f.stat().st_mtime_ns, "hash": _file_hash(f)}
+        for f in sources
+    ]
+    # write into a temporary folder first, so that readers never see partial entries
+    entry.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(dir=entry.parent, prefix=f".{entry.name}-"))
+    np.save(tmp / "values.npy", X.values)
+    np.save(tmp / "offsets.npy", X.offsets)
+    np.save(tmp / "labels.npy", np.asarray(y).astype(str))
+    (tmp / "sources.json").write_text(json.dumps(meta))
+    shutil.rmtree(entry, ignore_errors=True)
+    try:
+        os.replace(tmp, entry)
+    except OSError:
+        # another process has just written the same entry
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _cached_entry(dataset, data_folder, cache_folder):
+    data_folder = Path(data_folder)
+    entry = Path(cache_folder) / dataset
+    sources = _source_files(dataset, data_folder)
+    if sources and _is_cache_valid(entry, sources):
+        return entry
+
+    if dataset.startswith("edeniss"):
+        X, y, _ = read_ts_file(sources[0])
+    else:
+        # downloads the dataset if necessary
+        X, y = load_classification(dataset, extract_path=data_folder, load_equal_length=False)
+        sources = _source_files(dataset, data_folder)
+    _write_cache(entry, sources, X, y)
+    return entry
+
+
+def load_cached_dataset(dataset, data_folder=DATA_FOLDER, cache_folder=DATASET_CACHE_FOLDER):
+    """Load a (univariate) dataset from the binary dataset cache.
+
+    The first call parses the ``.ts`` files (and downloads the dataset if necessary)
+    and stores the values, offsets, and labels as ``.npy`` files; the entry is
+    invalidated when the size or the content of a source file changes. The values
+    are memory-mapped copy-on-write. Returns the series as `RaggedSeries` and the
+    labels.
+    """
+    entry = _cached_entry(dataset, data_folder, cache_folder)
+    values = np.load(entry / "values.npy", mmap_mode="c")
+    offsets = np.load(entry / "offsets.npy")
+    X = RaggedSeries(values, offsets, np.diff(offsets))
+    return X, np.load(entry / "labels.npy")
+
+
+def load_cached_labels(dataset, data_folder=DATA_FOLDER, cache_folder=DATASET_CACHE_FOLDER):
+    """Load only the labels of a dataset from the binary dataset cache."""
+    entry = _cached_entry(dataset, data_folder, cache_folder)
+    return np.load(entry / "labels.npy")
+
+
 def main(data_folder, datasets, skip_edeniss=False):
     data_folder = Path(data_folder).resolve()
     data_folder.mkdir(parents=True, exist_ok=True)
@@ -179,7 +290,8 @@ def main(data_folder, datasets, skip_edeniss=False):
     if datasets:
         print(f"Downloading datasets to {data_folder} ...", file=sys.stderr)
         for dataset in tqdm(datasets):
-            load_classification(dataset, extract_path=data_folder)
+            # downloads the dataset and fills the dataset cache
+            load_cached_labels(dataset, data_folder)
             print(dataset)
         print("... done.", file=sys.stderr)
 
@@ -187,6 +299,7 @@ def main(data_folder, datasets, skip_edeniss=False):
         print("Searching for edeniss datasets ...", file=sys.stderr)
         edeniss_datasets = select_edeniss_datasets(data_folder)
         for dataset in edeniss_datasets:
+            load_cached_labels(dataset, data_folder)
             print(dataset)
         if edeniss_datasets:
             print("... found.", file=sys.stderr)
@@ -0,0 +1,384 @@
+"""Streaming reader and writer for (univariate) time series in the ``.ts`` format.
+
+The data section is read in large blocks of whole lines; a numba kernel scans each
+block once and parses the values directly into the ragged layout of `RaggedSeries`,
+so parsing runs close to I/O speed and never holds the whole file in memory.
+"""
+from __future__ import annotations
+
+import re
+import sys
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+from numba import njit
+
+sys.path.append(str(Path(__file__).resolve().parent))
+from distances import RaggedSeries
+
+DEFAULT_CHUNK_BYTES = 64 * 1024**2
+# (timestamp,value) tuples of the data section
+_timestamp_pattern = re.compile(rb"\([^,()]*,([^()]*)\)")
+# powers of ten that are exact in float64
+_exact_powers_of_ten = np.array([10.0**k for k in range(23)])
+
+
+@dataclass
+class TsMetadata:
+    """The header of a ``.ts`` file; tag names are matched case-insensitively."""
+    problem_name: str = "data"
+    timestamps: bool = False
+    missing: bool = False
+    univariate: bool = True
+    equal_length: bool = False
+    series_length: Optional[int] = None
+    class_labels: Optional[List[str]] = None
+    target_label: bool = False
+    comments: List[str] = field(default_factory=list)
+
+    @property
+    def has_labels(self) -> bool:
+        return self.class_labels is not None or self.target_label
+
+
+def _parse_bool(value: str) -> bool:
+    return value.strip().lower() == "true"
+
+
+def read_ts_header(fh: BinaryIO) -> TsMetadata:
+    """Parse the header of an open ``.ts`` file; afterward, ``fh`` points to the data section."""
+    meta = TsMetadata()
+    for raw_line in fh:
+        line = raw_line.decode("utf-8").strip()
+        if not line:
+            continue
+        if line.startswith("#"):
+            # keep the comments verbatim, e.g., license headers
+            meta.comments.append(line[1:])
+            continue
+        if not line.startswith("@"):
+            raise ValueError(f"Invalid line in the .ts header: {line[:80]}")
+        tag, _, value = line[1:].partition(" ")
+        tag = tag.lower()
+        if tag == "data":
+            return meta
+        elif tag == "problemname":
+            meta.problem_name = value.strip()
+        elif tag == "timestamps":
+            meta.timestamps = _parse_bool(value)
+        elif tag == "missing":
+            meta.missing = _parse_bool(value)
+        elif tag == "univariate":
+            meta.univariate = _parse_bool(value)
+        elif tag == "dimension":
+            meta.univariate = int(value) == 1
+        elif tag == "equallength":
+            meta.equal_length = _parse_bool(value)
+        elif tag == "serieslength":
+            meta.series_length = int(value)
+        elif tag in ("classlabel", "classlabels"):
+            flag, *labels = value.split()
+            meta.class_labels = labels if _parse_bool(flag) else None
+        elif tag == "targetlabel":
+            meta.target_label = _parse_bool(value)
+    raise ValueError("The .ts file has no @data section")
+
+
+def _iter_line_blocks(fh: BinaryIO, chunk_bytes: int) -> Iterator[bytes]:
+    rest = b""
+    while True:
+        block = fh.read(chunk_bytes)
+        if not block:
+            break
+        block = rest + block
+        cut = block.rfind(b"\n") + 1
+        if cut == 0:
+            # a single line longer than the block
+            rest = block
+            continue
+        rest = block[cut:]
+        yield block[:cut]
+    if rest.strip():
+        yield rest
+
+
+@njit(cache=True, nogil=True)
+def _is_space(c: int) -> bool:
+    return c == 32 or c == 9 or c == 13
+
+
+@njit(cache=True, nogil=True)
+def _parse_float(buf: np.ndarray, start: int, stop: int, powers: np.ndarray) -> Tuple[float, bool]:
+    """Parse a decimal number; returns ``False`` if it needs Python's exact parser.
+
+    Uses the exact fast path: an integer mantissa below 2**53 scaled by an exact power
+    of ten yields the correctly rounded value.
+    """
+    while start < stop and _is_space(buf[start]):
+        start += 1
+    while stop > start and _is_space(buf[stop - 1]):
+        stop -= 1
+    if stop - start == 1 and buf[start] == 63:  # ?
+        return np.nan, True
+    i = start
+    negative = False
+    if i < stop and (buf[i] == 45 or buf[i] == 43):  # - or +
+        negative = buf[i] == 45
+        i += 1
+    mantissa = 0
+    n_digits = 0
+    exponent = 0
+    seen_digit = False
+    while i < stop and 48 <= buf[i] <= 57:
+        if mantissa > 0 or buf[i] != 48:
+            n_digits += 1
+        mantissa = mantissa * 10 + (buf[i] - 48) if n_digits <= 18 else mantissa
+        exponent += 0 if n_digits <= 18 else 1
+        seen_digit = True
+        i += 1
+    if i < stop and buf[i] == 46:  # .
+        i += 1
+        while i < stop and 48 <= buf[i] <= 57:
+            if mantissa > 0 or buf[i] != 48:
+                n_digits += 1
+            if n_digits <= 18:
+                mantissa = mantissa * 10 + (buf[i] - 48)
+                exponent -= 1
+            seen_digit = True
+            i += 1
+    if not seen_digit:
+        return np.nan, False
+    if i < stop and (buf[i] == 101 or buf[i] == 69):  # e or E
+        i += 1
+        exp_negative = False
+        if i < stop and (buf[i] == 45 or buf[i] == 43):
+            exp_negative = buf[i] == 45
+            i += 1
+        if i == stop:
+            return np.nan, False
+        e = 0
+        while i < stop and 48 <= buf[i] <= 57 and e < 10000:
+            e = e * 10 + (buf[i] - 48)
+            i += 1
+        exponent += -e if exp_negative else e
+    if i != stop or n_digits > 18 or mantissa > 2**53:
+        return np.nan, False
+    value = float(mantissa)
+    if mantissa == 0:
+        pass
+    elif 0 <= exponent <= 22:
+        value *= powers[exponent]
+    elif -22 <= exponent < 0:
+        value /= powers[-exponent]
+    else:
+        return np.nan, False
+    return -value if negative else value, True
+
+
+@njit(cache=True, nogil=True)
+def _scan_block(buf: np.ndarray, has_labels: bool, max_values: int, max_lines: int, powers: np.ndarray):
+    """Split a block of data lines into values, series lengths, and label spans.
+
+    Values that the fast path cannot parse are returned as byte spans with their index.
+    """
+    n = buf.shape[0]
+    values = np.empty(max_values, dtype=np.float64)
+    lengths = np.empty(max_lines, dtype=np.int64)
+    label_spans = np.empty((max_lines, 2), dtype=np.int64)
+    slow = np.empty((16, 3), dtype=np.int64)
+    n_values = 0
+    n_lines = 0
+    n_slow = 0
+    pos = 0
+    while pos < n:
+        line_end = pos
+        while line_end < n and buf[line_end] != 10:
+            line_end += 1
+        start = pos
+        stop = line_end
+        pos = line_end + 1
+        while start < stop and _is_space(buf[start]):
+            start += 1
+        while stop > start and _is_space(buf[stop - 1]):
+            stop -= 1
+        if start == stop:
+            continue
+
+        values_stop = stop
+        label_spans[n_lines, 0] = stop
+        label_spans[n_lines, 1] = stop
+        if has_labels:
+            colon = stop - 1
+            while colon >= start and buf[colon] != 58:  # :
+                colon -= 1
+            if colon >= start:
+                values_stop = colon
+                label_spans[n_lines, 0] = colon + 1
+
+        count = 0
+        token_start = start
+        while True:
+            token_stop = token_start
+            while token_stop < values_stop and buf[token_stop] != 44:  # ,
+                token_stop += 1
+            value, exact = _parse_float(buf, token_start, token_stop, powers)
+            if not exact:
+                if n_slow == slow.shape[0]:
+                    grown = np.empty((2 * n_slow, 3), dtype=np.int64)
+                    grown[:n_slow] = slow
+                    slow = grown
+                slow[n_slow, 0] = n_values
+                slow[n_slow, 1] = token_start
+                slow[n_slow, 2] = token_stop
+                n_slow += 1
+            values[n_values] = value
+            n_values += 1
+            count += 1
+            if token_stop >= values_stop:
+                break
+            token_start = token_stop + 1
+        lengths[n_lines] = count
+        n_lines += 1
+    return values[:n_values], lengths[:n_lines], label_spans[:n_lines], slow[:n_slow]
+
+
+def _parse_block(block: bytes, meta: TsMetadata) -> Tuple[RaggedSeries, List[str]]:
+    if meta.timestamps:
+        block = _timestamp_pattern.sub(rb"\1", block)
+    buf = np.frombuffer(block, dtype=np.uint8)
+    max_lines = block.count(b"\n") + 1
+    values, lengths, label_spans, slow = _scan_block(
+        buf, meta.has_labels, block.count(b",") + max_lines, max_lines, _exact_powers_of_ten
+    )
+    for i, start, stop in slow:
+        token = block[start:stop]
+        if b":" in token:
+            raise ValueError("Only univariate .ts files are supported")
+        values[i] = float(token)
+    labels = [block[start:stop].decode("utf-8").strip() for start, stop in label_spans] if meta.has_labels else []
+    offsets = np.zeros(lengths.shape[0] + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return RaggedSeries(values, offsets, lengths), labels
+
+
+def iter_ts_file(
+    path: Union[str, Path], chunk_bytes: int = DEFAULT_CHUNK_BYTES
+) -> Iterator[Tuple[RaggedSeries, np.ndarray]]:
+    """Stream the series of a ``.ts`` file in blocks of about ``chunk_bytes`` of text.
+
+    Yields the series of each block and their labels (empty without labels).
+    """
+    with open(path, "rb") as fh:
+        meta = read_ts_header(fh)
+        for block in _iter_line_blocks(fh, chunk_bytes):
+            series, labels = _parse_block(block, meta)
+            yield series, np.array(labels, dtype=str)
+
+
+def read_ts_file(
+    path: Union[str, Path], chunk_bytes: int = DEFAULT_CHUNK_BYTES
+) -> Tuple[RaggedSeries, np.ndarray, TsMetadata]:
+    """Read all series of a ``.ts`` file; returns the series, the labels, and the header."""
+    with open(path, "rb") as fh:
+        meta = read_ts_header(fh)
+    values, lengths, labels = [], [], []
+    for series, block_labels in iter_ts_file(path, chunk_bytes):
+        values.append(series.values)
+        lengths.append(series.lengths)
+        labels.append(block_labels)
+    lengths = np.concatenate(lengths) if lengths else np.empty(0, dtype=np.int64)
+    offsets = np.zeros(lengths.shape[0] + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    values = np.concatenate(values) if values else np.empty(0, dtype=np.float64)
+    labels = np.concatenate(labels) if labels else np.empty(0, dtype=str)
+    return RaggedSeries(values, offsets, lengths), labels, meta
+
+
+def _format_header(meta: TsMetadata) -> str:
+    lines = [f"#{c}" for c in meta.comments]
+    lines.append(f"@problemName {meta.problem_name}")
+    lines.append(f"@timeStamps {str(meta.timestamps).lower()}")
+    lines.append(f"@missing {str(meta.missing).lower()}")
+    lines.append(f"@univariate {str(meta.univariate).lower()}")
+    lines.append(f"@equalLength {str(meta.equal_length).lower()}")
+    if meta.equal_length and meta.series_length is not None:
+        lines.append(f"@seriesLength {meta.series_length}")
+    if meta.class_labels is not None:
+        lines.append(f"@classLabel true {' '.join(meta.class_labels)}")
+    elif meta.target_label:
+        lines.append("@targetLabel true")
+    else:
+        lines.append("@classLabel false")
+    lines.append("@data")
+    return "\n".join(lines) + "\n"
+
+
+def write_ts_file(
+    path: Union[str, Path],
+    series: RaggedSeries,
+    labels: Optional[np.ndarray] = None,
+    meta: Optional[TsMetadata] = None,
+    chunk_series: int = 10_000,
+) -> None:
+    """Write (univariate) series and their labels as a ``.ts`` file.
+
+    The header is derived from ``meta``; the series lengths, missing values, and
+    class labels are updated from the data.
+    """
+    series = RaggedSeries.from_series(series)
+    meta = replace(meta or TsMetadata(), comments=list(meta.comments) if meta else [])
+    meta.timestamps = False
+    meta.missing = bool(np.isnan(series.values).any())
+    meta.equal_length = bool(len(series) > 0 and np.all(series.lengths == series.lengths[0]))
+    meta.series_length = int(series.lengths[0]) if meta.equal_length else None
+    if labels is not None and not meta.target_label:
+        meta.class_labels = [str(label) for label in np.unique(labels)]
+    elif labels is None:
+        meta.class_labels = None
+        meta.target_label = False
+
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(_format_header(meta))
+        for start in range(0, len(series), chunk_series):
+            stop = min(len(series), start + chunk_series)
+            # shortest round-trip representation of all values of the chunk
+            values = series.values[series.offsets[start]:series.offsets[stop]]
+            text = list(map(repr, values.tolist()))
+            for i in np.flatnonzero(np.isnan(values)):
+                text[i] = "?"
+            offsets = series.offsets[start:stop + 1] - series.offsets[start]
+            lines = []
+            for k, i in enumerate(range(start, stop)):
+                line = ",".join(text[offsets[k]:offsets[k + 1]])
+                lines.append(f"{line}:{labels[i]}" if labels is not None else line)
+            fh.write("\n".join(lines) + "\n")
+
+
+def repair_ts_file(
+    source: Union[str, Path],
+    target: Union[str, Path],
+    problem_name: Optional[str] = None,
+    chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+) -> TsMetadata:
+    """Rewrite a ``.ts`` file with a normalized header and without timestamps.
+
+    The data section is streamed in blocks and only the timestamps are removed, so
+    the values are kept verbatim. ``target`` must not be ``source``. Returns the
+    normalized header.
+    """
+    with open(source, "rb") as src:
+        meta = read_ts_header(src)
+        had_timestamps = meta.timestamps
+        meta.timestamps = False
+        if problem_name is not None:
+            meta.problem_name = problem_name
+        with open(target, "wb") as dst:
+            dst.write(_format_header(meta).encode("utf-8"))
+            for block in _iter_line_blocks(src, chunk_bytes):
+                if had_timestamps:
+                    block = _timestamp_pattern.sub(rb"\1", block)
+                block = b"\n".join(line.strip() for line in block.split(b"\n") if line.strip()) + b"\n"
+                dst.write(block)
+    return meta
@@ -7,12 +7,18 @@ import numpy as np
 import matplotlib.pyplot as plt
 
 from pathlib import Path
+from scipy.spatial.distance import squareform
 from scipy.stats import kurtosis, skew
 
 from aeon.datasets import load_classification
-from aeon.distances import pairwise_distance, distance
+from aeon.distances import pairwise_distance
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "experiments"))
+from distances import DistanceCache, approximate_pdist, dataset_fingerprint
 
 cmap = plt.get_cmap("tab10")
+# aeon's MSM defaults (c=1.0, no window) in terms of our MSM implementation
+aeon_msm_params = {"constant": 1.0, "window": None, "itakura_max_slope": None}
 
 
 def parse_args(args):
@@ -43,9 +49,16 @@ def compute_stats(dataset, result_folder, resultfile):
     print(f"Loading dataset {dataset} and computing pairwise distances")
     X, y = load_classification(dataset, extract_path="data/datasets/", load_equal_length=False)
     ymap = {label: i for i, label in enumerate(np.unique(y))}
-    dists = pd.DataFrame(pairwise_distance(X, metric="msm"))
+    cache = DistanceCache()
+    fingerprint = dataset_fingerprint([x.ravel() for x in X])
+    dists = cache.condensed(fingerprint, "aeon-msm", {}, lambda: pairwise_distance(X, metric="msm"))
+    dists = pd.DataFrame(squareform(np.asarray(dists, dtype=np.float64)))
     X = [x.ravel() for x in X]
-    dists_approx = pd.DataFrame(_pairwise_approx_distance(X, metric="msm"))
+    dists_approx = cache.condensed(
+        fingerprint, "msm-center-snippet", {"snippet_size": 20, **aeon_msm_params},
+        lambda: _pairwise_approx_distance(X, metric="msm"),
+    )
+    dists_approx = pd.DataFrame(squareform(np.asarray(dists_approx, dtype=np.float64)))
     print("Mean exact distances:", dists.mean().mean())
     print("Mean approx distances:", dists_approx.mean().mean())
 
@@ -92,22 +105,12 @@ def compute_stats(dataset, result_folder, resultfile):
     plt.show()
 
 
-def _pairwise_approx_distance(X, metric="msm", snippet_size=20):
-    n = len(X)
-    dists = np.zeros((n, n))
-    for i in range(n):
-        for j in range(i + 1, n):
-            ts1 = X[i]
-            ts2 = X[j]
-            factor = max(len(ts1), len(ts2)) / snippet_size
-            dists[i, j] = distance(slice_center(ts1, snippet_size), slice_center(ts2, snippet_size), metric=metric) * factor
-            dists[j, i] = dists[i, j]
-    return dists
-
-
-def slice_center(x, length):
-    center = len(x) // 2
-    return x[center - length//2 : center + length//2]
+def _pairwise_approx_distance(X, metric="msm", snippet_size=20, strategy="center"):
+    # same parameters as aeon's default MSM used for the exact distances
+    params = aeon_msm_params if metric == "msm" else {}
+    return squareform(approximate_pdist(
+        X, metric, strategy, snippet_size, distance_params=params, n_jobs=-1
+    ))
 
 
 
@@ -4,37 +4,39 @@
 # in the metadata section and the timestamps from the data section.
 #
 # The input folder should contain one to many .ts files with the Eden ISS data. The
-# files will be copied to the output without modifications in the input folder.
+# files will be copied to the output without modifications in the input folder. Each
+# file is stored as <problem name>.ts, with '-' in the problem name replaced by '_'.
+#
+# The files are streamed, so that even multi-GB files are repaired at I/O speed.
 #
 # Dependencies:
-# - aeon
-# - numpy
+# - numba and numpy (via experiments/ts_format.py)
 #
 # Usage:
 # python fix_edeniss_format.py <input_folder> <output_folder>
 
+import os
 import sys
+import tempfile
 import time
 from pathlib import Path
 
-import numpy as np
-from aeon.datasets import load_from_tsfile, write_to_tsfile
+sys.path.append(str(Path(__file__).resolve().parent.parent / "experiments"))
+from ts_format import read_ts_header, repair_ts_file
 
 
 def fix_edeniss_format(input_folder: Path, output_folder: Path) -> None:
     output_folder.mkdir(parents=True, exist_ok=True)
 
-    for file in input_folder.glob("*.ts"):
-        X, y, meta = load_from_tsfile(file, return_meta_data=True)
-        problem_name = meta["problemname"].replace("-", "_")
+    for file in sorted(input_folder.glob("*.ts")):
+        with open(file, "rb") as fh:
+            problem_name = read_ts_header(fh).problem_name.replace("-", "_")
         print(f"Saving {problem_name} to {output_folder}")
-        write_to_tsfile(
-            X,
-            output_folder,
-            y,
-            problem_name=problem_name,
-            regression=meta["targetlabel"],
-        )
+        # write to a temporary file first, the input and output folder may be equal
+        fd, tmp = tempfile.mkstemp(dir=output_folder, suffix=".tmp")
+        os.close(fd)
+        repair_ts_file(file, tmp, problem_name=problem_name)
+        os.replace(tmp, output_folder / f"{problem_name}.ts")
 
 
 if __name__ == "__main__":
@@ -14,7 +14,10 @@ from scipy.spatial.distance import squareform
 from scipy.cluster import hierarchy
 from scipy.cluster.hierarchy import dendrogram, cut_tree
 from sklearn.metrics import adjusted_rand_score, jaccard_score
-from aeon.datasets import load_classification
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "experiments"))
+from distances import DistanceCache, file_fingerprint
+from download_datasets import load_cached_labels
 
 
 colors = defaultdict(lambda: "blue")
@@ -134,8 +137,8 @@ def plot_hierarchies(result_dir, data_dir, filename, dataset, distance, linkage)
     print(f"... loaded {len(hierarchies)} hierarchies.")
 
     print("Loading dataset to compute quality measures...")
-    X, y = load_classification(dataset, extract_path=data_dir, load_equal_length=False)
-    n = len(X)
+    y = load_cached_labels(dataset, data_dir)
+    n = len(y)
     m = n * (n - 1) / 2
     target_hierarchy = hierarchies[m]
     target_hierarchy_labels = cut_tree(target_hierarchy, n_clusters=20).flatten()
@@ -189,7 +192,13 @@ def plot_hierarchies(result_dir, data_dir, filename, dataset, distance, linkage)
 
 def plot_distances(result_dir, data_dir, filename, dataset, distance, linkage):
     print(f"Loading distance matrix for dataset {dataset} and distance {distance}")
-    dists = pd.read_csv(result_dir / f"distances-{distance}-{dataset}.csv", header=None).values
+    # parsing the CSV is slow for large datasets, so we cache the parsed matrix
+    dists_file = result_dir / f"distances-{distance}-{dataset}.csv"
+    dists = DistanceCache().condensed(
+        file_fingerprint(dists_file), f"csv-{distance}", {},
+        lambda: pd.read_csv(dists_file, header=None).values,
+    )
+    dists = squareform(np.asarray(dists, dtype=np.float64))
     print(dists)
 
     print(f"Computing target hierarchy for dataset {dataset}, distance {distance}, linkage {linkage}...")